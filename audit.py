@@ -0,0 +1,185 @@
+# Timing audit log for the working memory removal task.
+
+# When the audit_log config option is on, every draw, display update, cue and
+
+# stimulus onset, key press and response timeout is recorded with its clock
+
+# time. Events go into a results.RingLog: the task is the only writer and the
+
+# buffer is only read between blocks, so a record is a few array stores with
+
+# no lock and no file I/O. Each dump writes the events since the last one to
+
+# <pid>events.csv, through the writer thread of results.py. On quit a
+
+# summary of how far the onsets deviated from their plan is written to
+
+# <pid>timing.csv.
+
+import numpy
+import results, trial_schedule
+
+CAPACITY = 1 << 16  # events kept between dumps, older ones are overwritten
+
+KINDS = ['draw', 'flip', 'cue', 'stimulus', 'keydown', 'timeout']
+
+active_log = None  # EventLog that record writes to, None when the log is off
+
+
+class EventLog(results.RingLog):
+    """
+    This class records timed events into a ring buffer and dumps them to csv.
+
+    Attributes:
+    scheduler - Scheduler whose clock and epoch the events are timed on
+    """
+
+    def __init__(self, prefix, scheduler, capacity=CAPACITY):
+        super().__init__(capacity)
+        self.prefix = prefix
+        self.scheduler = scheduler
+        self.times = numpy.zeros(capacity, dtype=numpy.int64)
+        self.intended = numpy.zeros(capacity, dtype=numpy.int64)
+        self.kinds = numpy.zeros(capacity, dtype=numpy.int8)
+        self.labels = [None]*capacity
+
+        self.open_file(prefix+'events.csv',
+                       'Time_us: Event: Label: Intended_us:')
+
+    def record(self, kind, label, t_ns=None, intended_ns=None):
+        """
+        This function adds an event to the ring buffer.
+
+        Parameters:
+        kind, label, t_ns, intended_ns - one of KINDS, string naming the
+
+        event, clock time in ns or None for now, planned time in ns or None
+        """
+
+        i = self.slot()
+        self.times[i] = self.scheduler.now() if t_ns is None else t_ns
+        self.intended[i] = -1 if intended_ns is None else intended_ns
+        self.kinds[i] = KINDS.index(kind)
+        self.labels[i] = label
+
+    def text(self, start, stop):
+        index = numpy.arange(start, stop) % self.capacity
+
+        times = (self.times[index] - self.scheduler.epoch_ns)//1000
+        intended = numpy.where(self.intended[index] < 0, -1,
+                               (self.intended[index] -
+                                self.scheduler.epoch_ns)//1000)
+        rows = [str(t)+' '+KINDS[kind]+' ' +
+                str(self.labels[i]).replace(' ', '_')+' ' +
+                (str(planned) if planned >= 0 else 'NaN')+'\n'
+                for t, kind, i, planned in zip(times.tolist(),
+                                               self.kinds[index].tolist(),
+                                               index.tolist(),
+                                               intended.tolist())]
+        return ''.join(rows)
+
+    def close(self):
+        """
+        This function dumps the remaining events, closes the event file and
+
+        writes the summary of the session's onset deviations.
+        """
+
+        super().close()
+        results.background().submit(self._write_summary,
+                                    list(self.scheduler.onsets), self.lost)
+
+    def _write_summary(self, onsets, lost):
+        with open(self.prefix+'timing.csv', 'w') as file:
+            file.write('Measure: Count: Mean_us: Max_us:\n')
+            for measure, values in deviations(onsets):
+                values = numpy.asarray(values)/1000
+                file.write(measure+' '+str(len(values))+' ' +
+                           (str(round(values.mean(), 1))+' ' +
+                            str(round(values.max(), 1)) if len(values)
+                            else 'NaN NaN')+'\n')
+            file.write('lost_events '+str(lost)+' NaN NaN\n')
+
+
+def interval_errors(onsets):
+    """
+    This function measures how far every cue-to-update interval was from the
+
+    cue delay it was planned with.
+
+    Parameters:
+    onsets - Scheduler onsets list of (label, intended_ns, actual_ns)
+
+    Returns:
+    errors - dictionary mapping each cue delay in ms to a list of signed
+
+    interval errors in ns
+    """
+
+    errors = {delay: [] for delay in trial_schedule.CUE_DELAYS}
+    for previous, current in zip(onsets, onsets[1:]):
+        if previous[0] == 'cue' and current[0] == 'update':
+            planned = current[1] - previous[2]
+            delay = min(errors, key=lambda d: abs(d*1000000 - planned))
+            errors[delay].append(current[2] - previous[2] - delay*1000000)
+
+    return errors
+
+
+def deviations(onsets):
+    """
+    This function lists the timing deviations of a session: how late each
+
+    kind of onset was against its plan, and the absolute error of the
+
+    cue-to-update intervals for each cue delay.
+
+    Parameters:
+    onsets - Scheduler onsets list of (label, intended_ns, actual_ns)
+
+    Returns:
+    measures - list of (name, list of deviations in ns)
+    """
+
+    late = {}
+    for label, intended, actual in onsets:
+        late.setdefault(label, []).append(actual - intended)
+
+    measures = [('late_'+label, values) for label, values in late.items()]
+    measures += [('interval_error_'+str(delay), numpy.abs(values).tolist())
+                 for delay, values in interval_errors(onsets).items()]
+    return measures
+
+
+def record(kind, label, t_ns=None, intended_ns=None):
+    """
+    This function records an event in the active log, if there is one.
+
+    Parameters:
+    kind, label, t_ns, intended_ns - as for EventLog.record
+    """
+
+    if active_log is not None:
+        active_log.record(kind, label, t_ns, intended_ns)
+
+
+def dump():
+    """
+    This function writes out the active log's buffered events, e.g. after a
+
+    block, if there is an active log.
+    """
+
+    if active_log is not None:
+        active_log.dump()
+
+
+def close():
+    """
+    This function closes the active log, if there is one, and turns it off.
+    """
+
+    global active_log
+    if active_log is not None:
+        active_log.close()
+        active_log = None
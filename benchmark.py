@@ -0,0 +1,219 @@
+# Presentation latency benchmark for the working memory removal task.
+
+# Each task variant is run for a full session on the real clock and display,
+
+# answered by a fast and accurate simulated participant, with a fixed seed so
+
+# every machine replays the same schedules. While it runs, the rendering
+
+# operations of the presentation path are timed. Afterwards the onsets the
+
+# Scheduler recorded give how late each flip was and how far every
+
+# cue-to-update interval was from its nominal 1500 or 200 ms. The results
+
+# are saved as JSON, so machines and pygame versions can be compared.
+
+# python benchmark.py [letters digits words] [-o benchmark.json] [--headless]
+
+import argparse, contextlib, json, os, platform, sys, tempfile, time
+import numpy, pygame
+import audit, display, glyphs, simulation, timing, trial_schedule
+
+TASKS = {'letters': 'letters/letters.py', 'digits': 'digits/digits.py',
+         'words': 'words/words.py'}
+
+# presentation operations timed during a session
+OPERATIONS = [(display.Screen, 'background', 'background'),
+              (display.Screen, 'blit_centered', 'blit'),
+              (display.Screen, 'update', 'display_update'),
+              (display.Screen, 'update_all', 'display_update_all')]
+
+
+def summarize(samples_ns):
+    """
+    This function summarizes a latency distribution in us.
+
+    Parameters:
+    samples_ns - list of latencies in ns
+
+    Returns:
+    summary - dictionary with the count, p50, p95, p99 and max in us
+    """
+
+    if not len(samples_ns):
+        return {'n': 0}
+
+    samples = numpy.asarray(samples_ns)/1000
+    p50, p95, p99 = numpy.percentile(samples, [50, 95, 99])
+    return {'n': len(samples), 'p50_us': p50, 'p95_us': p95, 'p99_us': p99,
+            'max_us': samples.max()}
+
+
+def _timed(function, samples):
+    # wraps a function so that every call appends its duration in ns
+    def timed(*args, **kwargs):
+        start = time.perf_counter_ns()
+        result = function(*args, **kwargs)
+        samples.append(time.perf_counter_ns() - start)
+        return result
+    return timed
+
+
+class _TimedFont:
+    # stands in for the font given to glyphs.render_all and times each render
+    def __init__(self, font, samples):
+        self.render = _timed(font.render, samples)
+
+
+@contextlib.contextmanager
+def instrument(samples):
+    """
+    This context manager times every presentation operation and every glyph
+
+    render while it is active, appending durations in ns to lists in a
+
+    dictionary keyed by operation name.
+
+    Parameters:
+    samples - dictionary to collect the durations in
+    """
+
+    originals = [(owner, name, getattr(owner, name))
+                 for owner, name, label in OPERATIONS]
+    render_all = glyphs.render_all
+    try:
+        for owner, name, label in OPERATIONS:
+            setattr(owner, name,
+                    _timed(getattr(owner, name), samples.setdefault(label,
+                                                                    [])))
+        glyphs.render_all = lambda font, items, colour, previous=None: \
+            render_all(_TimedFont(font, samples.setdefault('render', [])),
+                       items, colour, previous)
+        yield samples
+    finally:
+        for owner, name, function in originals:
+            setattr(owner, name, function)
+        glyphs.render_all = render_all
+
+
+def onset_report(onsets, period_ns):
+    """
+    This function measures the timing of the presented events of a session.
+
+    A flip counts as dropping frames for every whole refresh period it came
+
+    after its intended onset.
+
+    Parameters:
+    onsets, period_ns - Scheduler onsets list, refresh period in ns
+
+    Returns:
+    report - dictionary with the lateness of all onsets, the dropped frames
+
+    and the absolute cue-to-update interval error for each cue delay
+    """
+
+    lateness = [actual - intended for label, intended, actual in onsets]
+    errors = audit.interval_errors(onsets)
+
+    return {'onset_lateness': summarize(lateness),
+            'dropped_frames': int(sum(max(late, 0)//period_ns
+                                      for late in lateness)),
+            'late_flips': int(sum(late >= period_ns for late in lateness)),
+            'interval_error': {str(delay): summarize(numpy.abs(error))
+                               for delay, error in errors.items()}}
+
+
+def benchmark_task(script, seed=0, headless=False, refresh_rate=60):
+    """
+    This function runs one benchmark session of a task variant, writing its
+
+    results to a temporary directory which is removed afterwards.
+
+    Parameters:
+    script, seed, headless, refresh_rate - path of the task script, seed of
+
+    the schedules, boolean stating whether to draw to SDL's dummy driver,
+
+    refresh rate used to count dropped frames if the config sets none
+
+    Returns:
+    report - dictionary of operation latencies and onset timing
+    """
+
+    participant = simulation.Participant('bench', rt_mean_ms=300,
+                                         rt_sd_ms=50, accuracy=1,
+                                         timeout_rate=0, rng=seed)
+
+    samples = {}
+    trial_schedule.shared_rng = numpy.random.default_rng(seed)
+    try:
+        # the window keeps the size of the display, so blits cost what they
+        # do in a real session
+        with instrument(samples), tempfile.TemporaryDirectory() as output:
+            session = simulation.run_session(script, participant,
+                                             timing.SystemClock(), headless,
+                                             output, window=None)
+    finally:
+        trial_schedule.shared_rng = None
+
+    scheduler = session.scheduler
+    period_ns = scheduler.period_ns or int(round(1e9/refresh_rate))
+
+    report = {'operations': {label: summarize(durations)
+                             for label, durations in samples.items()}}
+    report.update(onset_report(scheduler.onsets, period_ns))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the presentation '
+                                     'path of the task variants.')
+    parser.add_argument('tasks', nargs='*', default=list(TASKS),
+                        help='any of '+', '.join(TASKS))
+    parser.add_argument('-o', '--output', default='benchmark.json')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--headless', action='store_true',
+                        help='draw to the dummy driver instead of the screen')
+    parser.add_argument('--refresh-rate', type=int, default=60,
+                        help='Hz used to count dropped frames when the '
+                        'config sets no refresh rate')
+    args = parser.parse_args(argv)
+    for task in args.tasks:
+        if task not in TASKS:
+            parser.error('unknown task '+task)
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    results = {'machine': {'platform': platform.platform(),
+                           'processor': platform.processor(),
+                           'python': platform.python_version(),
+                           'pygame': pygame.version.ver,
+                           'sdl': '.'.join(map(str,
+                                               pygame.get_sdl_version())),
+                           'numpy': numpy.__version__},
+               'seed': args.seed, 'headless': args.headless, 'tasks': {}}
+
+    for task in args.tasks:
+        report = benchmark_task(os.path.join(root, TASKS[task]), args.seed,
+                                args.headless, args.refresh_rate)
+        results['tasks'][task] = report
+
+        print(task, 'dropped frames:', report['dropped_frames'])
+        for label, summary in report['operations'].items():
+            if summary['n']:
+                print('  %-20s p50 %8.1f  p99 %8.1f  max %8.1f us' %
+                      (label, summary['p50_us'], summary['p99_us'],
+                       summary['max_us']))
+        for delay, summary in report['interval_error'].items():
+            if summary['n']:
+                print('  %-20s p50 %8.1f  p99 %8.1f  max %8.1f us' %
+                      ('error '+delay+' ms', summary['p50_us'],
+                       summary['p99_us'], summary['max_us']))
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2, default=float)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# Display helpers for the working memory removal task.
+
+# The empty three-frame layout and its cued variants never change during a
+
+# session, so they are composited once into full-window surfaces and each
+
+# frame preparation is a single blit. During the task only the frames and the
+
+# stimuli inside them change, so the Screen pushes just those regions to the
+
+# display instead of the whole fullscreen window.
+
+import pygame
+import audit
+
+
+class Backgrounds:
+    """
+    This class holds the pre-composited full-window backgrounds.
+
+    Attributes:
+    blank - window filled with the background colour only
+
+    frames - blank window with the three black frames drawn on it
+
+    cued - list of three surfaces, each with one frame drawn as a red cue
+
+    cells - list of three rects covering the frames and their cue borders
+    """
+
+    def __init__(self, size, rects_pos, rect_side, background, frame_colour,
+                 cue_colour):
+        self.blank = pygame.Surface(size).convert()
+        self.blank.fill(background)
+
+        self.frames = self.blank.copy()
+        for pos in rects_pos:
+            pygame.draw.rect(self.frames, frame_colour,
+                             (pos[0], pos[1], rect_side, rect_side), 1)
+
+        self.cued = []
+        for pos in rects_pos:
+            cued = self.frames.copy()
+            pygame.draw.rect(cued, cue_colour,
+                             (pos[0], pos[1], rect_side, rect_side), 2)
+            self.cued.append(cued)
+
+        self.cells = [pygame.Rect(pos[0], pos[1], rect_side,
+                                  rect_side).inflate(2, 2)
+                      for pos in rects_pos]
+
+
+class Screen:
+    """
+    This class draws backgrounds and glyphs onto the window and remembers
+
+    which regions changed, so that update only pushes those rects.
+
+    Swapping the background marks the three frame cells and every glyph
+
+    drawn since the last swap. Anything drawn straight onto the window
+
+    (instruction screens, typed input) must be shown with update_all,
+
+    after which the next update pushes the whole window once.
+    """
+
+    def __init__(self, win, cells):
+        self.win = win
+        self.cells = cells
+        self._dirty = []
+        self._drawn = []  # glyph rects drawn since the last background
+        self._full = True
+
+    def background(self, surface):
+        """
+        This function replaces the window contents with a cached background.
+
+        Parameters:
+        surface - full-window background surface
+        """
+
+        self.win.blit(surface, (0, 0))
+        audit.record('draw', 'background')
+        self._dirty.extend(self.cells)
+        self._dirty.extend(self._drawn)
+        self._drawn = []
+
+    def blit_centered(self, surface, center):
+        """
+        This function draws a glyph centered on a position.
+
+        Parameters:
+        surface, center - glyph surface, (x, y) center on the window
+
+        Returns:
+        rect - area of the window covered by the glyph
+        """
+
+        rect = self.win.blit(surface, surface.get_rect(center=center))
+        audit.record('draw', 'glyph')
+        self._dirty.append(rect)
+        self._drawn.append(rect)
+
+        return rect
+
+    def update(self):
+        """
+        This function pushes the regions changed since the last update.
+        """
+
+        if self._full:
+            pygame.display.update()
+            self._full = False
+        else:
+            pygame.display.update(self._dirty)
+        audit.record('flip', 'dirty')
+        self._dirty = []
+
+    def update_all(self):
+        """
+        This function pushes the whole window, e.g. for instruction screens.
+        """
+
+        pygame.display.update()
+        audit.record('flip', 'full')
+        self._dirty = []
+        self._drawn = []
+        self._full = True  # untracked drawing must be cleared by a full push
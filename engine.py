@@ -0,0 +1,762 @@
+# Working memory removal task engine, as described in the study:
+
+# Singh, K. A., Gignac, G. E., Brydges, C. R., & Ecker, U. K. (2018). Working
+
+# memory capacity mediates the relationship between removal and fluid
+
+# intelligence. Journal of Memory and Language, 101, 18-36.
+
+# The letter, digit and word versions of the task share this engine. A task
+
+# config selects the stimuli with its task option (see stimuli.py), and the
+
+# scripts in the task directories only start the engine with their config.
+
+# Each session writes its results to the directory of the config, or to the
+
+# results directory a tool such as simulation.py passes to run. The two main
+
+# result csv files are (participant id)upd.csv, which lists every update
+
+# trial along with the block (called trial in original literature), reaction
+
+# time, time between cue and update (the variable differentiating
+
+# conditions) and onsets, and (participant id)mem.csv, which records the
+
+# accuracy, reaction time, response and onset of each frame test by block.
+
+# Every session also writes (participant id)keys.csv with every key press
+
+# (see inputs.py), (participant id)io.csv with the writer thread's queue and
+
+# the lost key presses (see results.py) and (participant id).npz with the
+
+# update and test records as typed columns. With the audit_log option on,
+
+# (participant id)events.csv and (participant id)timing.csv are written as
+
+# well (see audit.py).
+
+import configparser, os, sys
+import numpy, pygame
+from pygame.locals import *
+import audit, display, fonts, glyphs, inputs, markers, results
+import stimuli, timing, trial_schedule, wrapper
+
+# setting the value for color variables
+RED = (255, 0, 0)
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+
+RESPONSE_TIMEOUT = 5000  # ms after an update before the timeout warning
+
+FONT = 'Arial'
+INSTRUCTION_SIZE = 40  # font size of the instruction screens
+
+
+class Config:
+    """
+    This class holds the settings and messages read from a task config file.
+
+    Reading it needs no display, so tools can load a config cheaply.
+
+    Attributes:
+    directory - directory of the config file
+
+    results_directory - directory results are written to, by default the
+
+    directory of the config file
+
+    window_size - (width, height) of the window, None for fullscreen
+
+    provider - stimulus provider selected by the task option
+
+    blocks, practice_blocks, updates - number of main and practice blocks,
+
+    maximum number of updates per block
+
+    stim_delay, cross_delay - ms the starting stimuli and the fixation cross
+
+    are shown for
+    """
+
+    def __init__(self, config_path, results_directory=None,
+                 window_size=None):
+        self.directory = os.path.dirname(os.path.abspath(config_path))
+        self.results_directory = results_directory or self.directory
+        self.window_size = window_size
+
+        confg = configparser.ConfigParser()
+        confg.read(config_path)
+        self.provider = stimuli.from_config(confg, self.directory)
+
+        # variables which might be useful to adjust:
+        self.blocks = int(confg.get('var', 'blocks'))
+        self.practice_blocks = int(confg.get('var', 'practice_blocks'))
+        self.updates = int(confg.get('var', 'updates'))
+        self.stim_delay = int(confg.get('var', 'stim_delay'))
+        self.cross_delay = int(confg.get('var', 'cross_delay'))
+        self.rect_side_divisor = int(confg.get('var', 'rect_side_divisor'))
+        self.font_size = int(confg.get('var', 'font_size'))
+        self.refresh_rate = int(confg.get('var', 'refresh_rate',
+                                          fallback='0'))
+        self.audit_log = int(confg.get('var', 'audit_log', fallback='0'))
+        self.avoid_removed = int(confg.get('var', 'avoid_removed',
+                                           fallback='0'))
+        self.markers = confg.get('var', 'markers', fallback='')
+
+        # messages that will be displayed to participant
+        self.pid_request = confg.get('message', 'pid_request')
+        self.instructions = confg.get('message', 'instructions')
+        self.instructions2 = confg.get('message', 'instructions2pt1')+" "+ \
+            str(self.practice_blocks)+" "+confg.get('message',
+                                                    'instructions2pt2')
+        self.instructions3 = confg.get('message', 'instructions3')
+        self.timeout_warning = confg.get('message', 'timeout_warning')
+        self.testing_phase_instr = confg.get('message', 'testing_phase_instr')
+        self.exit_message = confg.get('message', 'exit_message')
+
+
+class Session:
+    """
+    This class runs one session of the task. Nothing is shown until start
+
+    opens the window and renders every stimulus.
+
+    Attributes:
+    config - Config of the task
+
+    win, screen, backgrounds - display surface, Screen drawing on it and the
+
+    pre-composited backgrounds
+
+    scheduler - Scheduler presenting every timed display event
+
+    glyph_cache - dictionary of pre-rendered surfaces of the stimuli scheduled
+
+    for the current run of blocks
+
+    fonts - FontRegistry the stimulus and instruction fonts are loaded from
+
+    filename, upd_file, mem_file - participant ID and the writers of the
+
+    updating and testing results, set by get_pid
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.win = self.screen = self.backgrounds = None
+        self.scheduler = self.glyph_cache = self.font_obj = None
+        self.fonts = None
+        self.filename = self.upd_file = self.mem_file = None
+
+    def start(self):
+        """
+        This function opens the window, fullscreen unless the config sets a
+
+        window size, initializes pygame and prepares everything drawn during
+
+        the session.
+        """
+
+        config = self.config
+        if config.window_size is None:
+            self.win = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        else:
+            self.win = pygame.display.set_mode(config.window_size)
+        self.win_width, self.win_height = self.win.get_size()
+        self.rect_side = self.win_height/config.rect_side_divisor
+
+        # setting positions of stimuli and frames:
+        first_rect = (self.win_width/2-self.rect_side/2,
+                      self.win_height/2-self.rect_side/2)
+
+        self.rects_pos = [(first_rect[0]-1.5*self.rect_side, first_rect[1]),
+                          (first_rect[0], first_rect[1]),
+                          (first_rect[0]+1.5*self.rect_side, first_rect[1])]
+
+        self.positions = [(first_rect[0]-self.rect_side,
+                           first_rect[1]+.5*self.rect_side),
+                          (self.win_width/2, self.win_height/2),
+                          (first_rect[0]+2*self.rect_side,
+                           first_rect[1]+.5*self.rect_side)]
+
+        self.font_obj = self.initialize_pygame()
+        self.backgrounds = display.Backgrounds(self.win.get_size(),
+                                               self.rects_pos, self.rect_side,
+                                               WHITE, BLACK, RED)
+        self.screen = display.Screen(self.win, self.backgrounds.cells)
+        self.scheduler = timing.Scheduler(config.refresh_rate)
+        inputs.active_buffer = inputs.KeyBuffer(self.scheduler)
+        self.glyph_cache = glyphs.render_all(self.font_obj, [], BLACK)
+
+    def draw_frames(self):
+        """
+        This function blanks out the window and draws three frames.
+        """
+
+        self.screen.background(self.backgrounds.frames)  # pre-composited
+
+    def save_and_quit(self):
+        """
+        This function exits the program after writing out and closing the
+
+        update and testing results files and saving the whole session to npz.
+
+        It returns only once the writer thread has written every file.
+        """
+
+        if self.upd_file is not None:
+            self.upd_file.close()  # write any remaining updates and close
+            self.mem_file.close()
+            results.save_session(os.path.join(self.config.results_directory,
+                                              self.filename+'.npz'),
+                                 self.upd_file, self.mem_file)
+        audit.close()  # write the timing summary if the audit log is on
+        lost_keys = inputs.close()  # write the remaining key presses
+
+        # wait for the writer thread to finish every file, and save how full
+        # its queue got
+        stats = None
+        if self.filename is not None:
+            stats = os.path.join(self.config.results_directory,
+                                 self.filename+'io.csv')
+        results.drain(stats, [('lost_key_presses', lost_keys)])
+        wrapper.clearLayouts()  # the session's fonts go with pygame.quit
+        pygame.quit()
+
+    def escape(self):
+        """
+        This function ends the session early when the participant presses
+
+        the escape key, keeping every result recorded so far.
+        """
+
+        self.save_and_quit()
+        sys.exit()
+
+    def wait_for_space(self):
+        """
+        This function loops continuously until the space key is pressed.
+        """
+
+        inputs.drain()
+        loop = True
+        while loop:
+            for event in inputs.wait_events():
+                if event.type == pygame.KEYDOWN and \
+                   event.key == pygame.K_SPACE:
+                    loop = False
+
+    def print_instructions(self, message):
+        """
+        This prints a wrapped message to the screen and waits for a key press
+
+        Parameters:
+        message - String to be displayed to the participant
+        """
+
+        inst_font = self.fonts.get(FONT, INSTRUCTION_SIZE)  # loaded at start
+        self.win.fill(WHITE)
+        wrapper.renderTextCenteredAt(message, inst_font, BLACK,
+                                     self.win_width/2, self.win_height/4,
+                                     self.win, self.win_width*0.75)
+        self.screen.update_all()
+        self.wait_for_space()
+
+    def get_pid(self, message):
+        """
+        This function asks the participant for their ID and opens the results
+
+        files starting with the string returned, in the results directory.
+
+        Parameters:
+        message - A string requesting the participant ID from the participant
+        """
+
+        while True:
+            kwargs = {'message': message}
+            pid = self.get_user_input(False, **kwargs)
+
+            prefix = os.path.join(self.config.results_directory, pid)
+            if not os.path.isfile(prefix+'upd.csv'):
+                self.filename = pid
+                self.upd_file = results.ResultWriter(prefix+'upd.csv',
+                                                     results.UpdateRecord)
+                self.mem_file = results.ResultWriter(prefix+'mem.csv',
+                                                     results.MemoryRecord)
+                inputs.active_buffer.open(prefix)
+                if self.config.audit_log:
+                    audit.active_log = audit.EventLog(prefix, self.scheduler)
+                return
+
+            message = 'PID already taken. Please try again:'
+
+    def display_starting_stimuli(self, start_set):
+        """
+        This function prints the scheduled starting stimuli in their
+
+        associated frames, and waits for a specified interval.
+
+        Parameters:
+        start_set - array of three scheduled indices into the provider items
+
+        Returns:
+        sample - list of starting stimuli
+        """
+
+        screen, scheduler = self.screen, self.scheduler
+        screen.background(self.backgrounds.blank)
+        inputs.drain()
+        surface = self.glyph_cache[glyphs.FIXATION]
+        screen.blit_centered(surface, self.positions[1])
+        cross_onset = scheduler.present('fixation', scheduler.now(),
+                                        screen.update)
+
+        provider = self.config.provider
+        sample = [provider.items[i] for i in start_set]
+        self.draw_frames()
+
+        for frame in range(3):
+            surface = self.glyph_cache[provider.text(sample[frame])]
+            screen.blit_centered(surface, self.positions[frame])
+
+        start_onset = scheduler.present(
+            'start', scheduler.plan(cross_onset, self.config.cross_delay),
+            screen.update)
+
+        # give participant time to remember the stimuli
+        self.draw_frames()
+        scheduler.present('start_off',
+                          scheduler.plan(start_onset, self.config.stim_delay),
+                          screen.update)
+
+        return sample
+
+    def update_stimuli(self, sample, schedule, block, step):
+        """
+        This function updates one of the three stimuli as given by the
+
+        schedule and prints it to screen. The waiting condition is also taken
+
+        from the schedule for each update.
+
+        Parameters:
+        sample, schedule, block, step - list of stimuli, Schedule for the
+
+        current blocks, index of the block, index of the update step
+
+        Returns:
+        delay, onsets - a waiting time interval which dictates the experimental
+
+        condition, list of the planned and actual cue and update onsets in ns
+        """
+
+        screen, scheduler = self.screen, self.scheduler
+        item = self.config.provider.items[schedule.update_items[block, step]]
+        update_frame = schedule.update_frames[block, step]
+        screen.background(self.backgrounds.cued[update_frame])  # red cue
+
+        # first and second delays together are the same for both conditions
+        first_delay = int(schedule.first_delays[block, step])  # before cue
+        delay = int(schedule.delays[block, step])  # after cue; condition
+
+        cue_planned = scheduler.plan(scheduler.now(), first_delay)
+        cue_onset = scheduler.present('cue', cue_planned, screen.update)
+
+        sample[update_frame] = item
+        surface = self.glyph_cache[self.config.provider.text(item)]
+        screen.blit_centered(surface, self.positions[update_frame])
+
+        # the update is planned from the actual cue onset, so a late cue does
+        # not change the cue-to-update interval
+        update_planned = scheduler.plan(cue_onset, delay)
+        update_onset = scheduler.present('update', update_planned,
+                                         screen.update)
+
+        return delay, [cue_planned, cue_onset, update_planned, update_onset]
+
+    def check_for_encoding(self, pt_response, onset):
+        """
+        This function waits for a key press after an update to the stimuli to
+
+        confirm encoding of the update. Displays a timeout message after
+
+        5 seconds has passed.
+
+        Parameters:
+        pt_response, onset - boolean stating whether or not the participant
+
+        has yet responded, update onset in ns
+
+        Returns:
+        pt_response, rt, rt_source - boolean signifying pt has responded,
+
+        reaction time for response in us, source of the response timestamp
+        """
+
+        deadline = onset + RESPONSE_TIMEOUT*1000000
+        loop = True
+        mark = inputs.drain(onset)
+
+        while loop:
+
+            if self.scheduler.now() >= deadline:
+                self.print_instructions(self.config.timeout_warning)
+                rt = "NaN"
+                rt_source = "NaN"
+                break
+
+            # record response and reaction time
+            for event in inputs.wait_events(deadline, inputs.CONFIRM):
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        self.escape()
+                    # the time the key press was recorded with, as in keys.csv
+                    t_ns, rt_source = inputs.active_buffer.time_of(event,
+                                                                   mark)
+                    rt = (t_ns - onset)//1000
+                    loop = False  # break inner loop (move onto an update)
+                    pt_response = True  # break outer loop (not a "repeat")
+                    break  # later keys of the same batch are not the response
+
+        self.draw_frames()
+        self.screen.update()
+
+        return pt_response, rt, rt_source
+
+    def run_blocks(self, blocks, practice=False):
+        """
+        This function calls the last three functions to display starting
+
+        stimuli, and then perform all updating steps for all blocks. After
+
+        all trials are completed for each block it prints additional
+
+        instructions and triggers the testing phase.
+
+        Parameters:
+        blocks, practice - number of (practice or testing) blocks, boolean
+
+        stating whether these are practice blocks or the main experiment
+        """
+
+        # draw every random value for these blocks before anything is shown
+        schedule = trial_schedule.build_schedule(
+            blocks, self.config.updates, len(self.config.provider.items),
+            self.config.provider.spacing, self.config.provider.wrap,
+            groups=self.config.provider.groups,
+            avoid_removed=self.config.avoid_removed)
+
+        # render only the stimuli these blocks can show, before any of them
+        provider = self.config.provider
+        shown = numpy.union1d(schedule.start_sets, schedule.update_items)
+        self.glyph_cache = glyphs.render_all(
+            self.font_obj, [provider.text(provider.items[i]) for i in shown],
+            BLACK, self.glyph_cache)
+
+        for block in range(blocks):
+
+            sample = self.display_starting_stimuli(schedule.start_sets[block])
+
+            for update in range(schedule.block_lengths[block]):
+                pt_response = False
+                while not pt_response:  # a timed out update is repeated
+                    delay, onsets = self.update_stimuli(sample, schedule,
+                                                        block, update)
+                    pt_response, rt, rt_source = self.check_for_encoding(
+                        pt_response, onsets[3])
+
+                if not practice:
+                    onsets = [self.scheduler.to_us(t) for t in onsets]
+                    self.upd_file.append(results.UpdateRecord(
+                        block+1, update+1, rt, rt_source, delay, *onsets))
+
+            if practice and block == 0:
+                self.print_instructions(self.config.testing_phase_instr)
+
+            self.testing_phase(practice, sample, block,
+                               schedule.test_orders[block])
+
+            if not practice:  # write this block to disk in the background
+                self.upd_file.flush_block()
+                self.mem_file.flush_block()
+            audit.dump()  # write the timing events of the block, if logged
+            inputs.dump()  # and its key presses
+
+    def testing_phase(self, practice, sample, block, frameorder):
+        """
+        This function tests the recall of each frame in the scheduled order
+
+        and records the accuracy and reaction time of every answer.
+
+        Parameters:
+        practice, sample, block, frameorder - boolean stating whether these
+
+        are practice blocks or the main experiment, list of stimuli, number of
+
+        (practice or testing) block, scheduled order in which frames are tested
+        """
+
+        self.draw_frames()
+        self.screen.update()
+
+        surface = self.glyph_cache[glyphs.QUESTION]
+        self.scheduler.wait(500)
+
+        for frame in frameorder:
+
+            self.screen.blit_centered(surface, self.positions[frame])
+
+            onset = self.scheduler.present('test', self.scheduler.now(),
+                                           self.screen.update)
+
+            if self.config.provider.typed:
+                kwargs = {'frame': frame, 'sample': sample, 'onset': onset}
+                response, correct, rt, rt_source = self.get_user_input(
+                    True, **kwargs)
+            else:
+                response, correct, rt, rt_source = self.get_key_response(
+                    self.config.provider.answer(sample[frame]), onset)
+                self.draw_frames()
+                self.screen.update()
+
+            if not practice:
+                self.mem_file.append(results.MemoryRecord(
+                    block+1, correct, rt, rt_source, response, sample[frame],
+                    self.scheduler.to_us(onset), frame))
+
+    def get_key_response(self, answer, onset):
+        """
+        This function waits for a single key press answering a tested frame.
+
+        Parameters:
+        answer, onset - key name scored as correct, onset of the test in ns
+
+        Returns:
+        response, correct, rt, rt_source - name of the key pressed, response
+
+        accuracy, reaction time in us and its source
+        """
+
+        loop = True
+        correct = False
+        mark = inputs.drain(onset)
+
+        while loop:
+
+            for event in inputs.wait_events(prompt=inputs.RECALL,
+                                            answer=answer):
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        self.escape()
+
+                    loop = False
+                    # without spaces, e.g. left_shift, like keys.csv
+                    response = pygame.key.name(event.key).replace(' ', '_')
+                    t_ns, rt_source = inputs.active_buffer.time_of(event,
+                                                                   mark)
+                    rt = (t_ns - onset)//1000
+
+                    if rt > 4999999:
+                        rt = "NaN"
+
+                    if response == answer:
+                        correct = True
+                    break  # the first key press is the response
+
+        return response, correct, rt, rt_source
+
+    def get_user_input(self, test_phase, **kwargs):
+        """
+        This function retrieves a string entered by the user as either a
+
+        participant ID or a testing step. After each letter it calls a second
+
+        function to draw the entry to the screen. The entry is decoded from
+
+        every key press recorded since the prompt, so none are lost between
+
+        waits.
+
+        Parameters:
+        test_phase, **kwargs - boolean stating whether this is the test phase
+
+        or PID entry, dictionary containing either stimuli, test frame and its
+
+        onset (for test phase) or instructions (PID entry)
+
+        Returns:
+        response, correct, rt, rt_source - participant response, response
+
+        accuracy, reaction time in us and its source if testing phase
+
+        p_input - input string if PID entry phase
+        """
+
+        correct = False
+        response = []
+        rt = rt_source = "NaN"
+        mark = inputs.drain(kwargs.get('onset'))
+        self.draw_user_input('', test_phase, **kwargs)
+
+        if test_phase:  # only the first three letters of a word are typed
+            prompt, length = inputs.RECALL, stimuli.PREFIX
+            answer = self.config.provider.answer(
+                kwargs['sample'][kwargs['frame']])
+        else:
+            prompt, length, answer = inputs.ENTRY, None, None
+
+        loop = True
+        while loop:
+            for event in inputs.wait_events(prompt=prompt, answer=answer):
+                if event.type == KEYDOWN and event.key == pygame.K_ESCAPE:
+                    self.escape()
+                elif event.type == QUIT:
+                    loop = False
+
+            # decode the whole entry so far, keys of earlier waits included
+            p_input, done = inputs.typed(inputs.active_buffer.since(mark),
+                                         length)
+            if done is not None:
+                loop = False
+                if test_phase:
+                    response = p_input
+                    rt = (done[1] - kwargs['onset'])//1000
+                    rt_source = done[2]
+
+                    if rt > 4999999:
+                        rt = "NaN"
+
+                    if response.lower() == answer:
+                        correct = True
+
+            self.draw_user_input(p_input if loop or test_phase else '',
+                                 test_phase, **kwargs)
+
+        if test_phase:
+            return response, correct, rt, rt_source
+        else:
+            return p_input
+
+    def draw_user_input(self, key, test_phase, **kwargs):
+        """
+        This function draws a string to the screen letter by letter as
+
+        the participant enters it.
+
+        Parameters:
+        key, test_phase, **kwargs - last key press, boolean stating whether
+
+        this is the test phase or PID entry, dictionary containing either
+
+        stimuli and test frame (for test phase) or instructions (PID entry)
+        """
+
+        win = self.win
+        win.fill(WHITE)
+        pid_surface = self.font_obj.render(key, True, BLACK)
+        rect = pid_surface.get_rect()
+
+        if test_phase:
+            question_mark = self.glyph_cache[glyphs.QUESTION]
+            rect.centerx = win.get_rect().centerx
+            rect.centery = win.get_rect().centery + 200
+            self.draw_frames()
+            win.blit(question_mark, question_mark.get_rect(
+                center=self.positions[kwargs['frame']]))
+        else:
+            message_surface = self.font_obj.render(kwargs['message'], False,
+                                                   BLACK)
+            win.blit(message_surface, message_surface.get_rect(
+                center=(self.win_width/2, self.win_height/2.5)))
+            rect.center = win.get_rect().center
+
+        win.blit(pid_surface, rect)
+        self.screen.update_all()
+
+    def initialize_pygame(self):
+        """
+        This function initializes the pygame module to open a window to draw
+
+        stimuli. The stimulus and instruction fonts are loaded here so that
+
+        no font is looked up between screens.
+
+        Returns:
+        font_obj - font object to render text to screen
+        """
+
+        pygame.init()
+        inputs.setup()  # only key presses and quit events wake the task
+        pygame.display.set_caption("Working Memory Removal")
+        pygame.mouse.set_visible(False)
+        self.fonts = fonts.FontRegistry()
+        font_obj = self.fonts.get(FONT, self.config.font_size)
+        self.fonts.get(FONT, INSTRUCTION_SIZE)
+
+        return font_obj
+
+    def run_experiment(self):
+        """
+        This function asks for the participant ID, prints instructions to the
+
+        screen in the appropriate order and calls the run_blocks function to
+
+        run the experiment, once for the practice blocks and once for the main
+
+        blocks
+        """
+
+        self.get_pid(self.config.pid_request)
+        self.print_instructions(self.config.instructions)
+        self.print_instructions(self.config.instructions2)
+        self.run_blocks(self.config.practice_blocks, True)
+        self.print_instructions(self.config.instructions3)
+        self.run_blocks(self.config.blocks)
+        self.print_instructions(self.config.exit_message)
+        self.save_and_quit()
+
+
+def run(config_path, results_directory=None, window_size=None):
+    """
+    This function runs a full session of the task.
+
+    Parameters:
+    config_path, results_directory, window_size - path of the task config
+
+    file, directory to write the results to instead of the config's, size of
+
+    a window to open instead of the fullscreen one
+
+    Returns:
+    session - the finished Session
+    """
+
+    config = Config(config_path, results_directory, window_size)
+    session = Session(config)
+    if config.markers:  # send event markers to the recorders while it runs
+        markers.run_session(session, markers.from_spec(config.markers,
+                                                       config.directory))
+    else:
+        session.start()
+        session.run_experiment()
+
+    return session
+
+
+def main(argv=None):
+    """
+    This function runs a session with the config given on the command line.
+    """
+
+    args = argv if argv is not None else sys.argv[1:]
+    if len(args) != 1:
+        sys.exit('usage: python engine.py <task config file>')
+
+    run(args[0])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# Font registry for the working memory removal task.
+
+# pygame.font.SysFont scans every installed font to find a font file by name,
+
+# which takes hundreds of milliseconds on some systems, and loads the file
+
+# again on every call. The registry looks a font file up only when a font is
+
+# first asked for, remembers the path in a JSON file so later launches skip
+
+# the scan, and keeps one loaded Font object for each name and size. A font
+
+# that is not installed, like Arial on many Linux machines, is remembered as
+
+# null so later launches go straight to pygame's default font.
+
+import json, os
+import pygame
+
+CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                     'font_cache.json')  # font paths found by earlier launches
+
+
+class FontRegistry:
+    """
+    This class loads fonts by name and size, resolving each font file once.
+
+    Attributes:
+    cache_path - JSON file the resolved font paths are kept in
+
+    paths - dictionary mapping lower case font names to font file paths, or
+
+    to None for fonts which are not installed
+
+    fonts - dictionary mapping (name, size) to loaded Font objects
+    """
+
+    def __init__(self, cache_path=CACHE):
+        self.cache_path = cache_path
+        self.fonts = {}
+        try:
+            with open(cache_path, 'r') as file:
+                self.paths = json.load(file)
+        except (OSError, ValueError):
+            self.paths = {}
+
+    def path(self, name):
+        """
+        This function finds the file of a system font, scanning the system
+
+        fonts only if no earlier launch has looked for it or the file found
+
+        has since gone.
+
+        Parameters:
+        name - font name as given to pygame.font.SysFont
+
+        Returns:
+        path - path of the font file, or None for pygame's default font
+        """
+
+        key = name.lower()
+        if key in self.paths:
+            path = self.paths[key]
+            if path is None or os.path.isfile(path):  # None: not installed
+                return path
+
+        path = pygame.font.match_font(name)
+        self.paths[key] = path
+        self.save()
+        return path
+
+    def get(self, name, size):
+        """
+        This function returns a font, loading it on the first request only.
+
+        Parameters:
+        name, size - font name as given to pygame.font.SysFont, size in points
+
+        Returns:
+        font - pygame Font object
+        """
+
+        font = self.fonts.get((name, size))
+        if font is None:
+            font = pygame.font.Font(self.path(name), size)
+            self.fonts[(name, size)] = font
+        return font
+
+    def save(self):
+        """
+        This function writes the resolved font paths to the cache file. A
+
+        cache that cannot be written only costs the scan on the next launch.
+        """
+
+        try:
+            with open(self.cache_path+'.tmp', 'w') as file:
+                json.dump(self.paths, file, indent=1)
+            os.replace(self.cache_path+'.tmp', self.cache_path)
+        except OSError:
+            pass
@@ -0,0 +1,44 @@
+# Pre-rendered glyph surfaces for the working memory removal task.
+
+# Rendering text with a pygame font rasterizes it on the spot, which takes a
+
+# variable amount of time. Before each run of blocks the task renders every
+
+# stimulus its schedule can show, and only blits the cached surfaces while
+
+# stimuli are timed. Only scheduled stimuli are kept, so the cache stays small
+
+# however long the word list is.
+
+FIXATION = '+'
+QUESTION = '?'
+
+
+def render_all(font, items, colour, previous=None):
+    """
+    This function renders every stimulus item, the fixation cross and the
+
+    question mark once and converts them to the display pixel format.
+
+    Parameters:
+    font, items, colour, previous - pygame font object, iterable of strings
+
+    to render, colour of the text, optional earlier cache whose surfaces are
+
+    reused instead of rendered again
+
+    Returns:
+    cache - dictionary mapping each string to its rendered surface
+    """
+
+    previous = previous or {}
+    cache = {}
+    for item in list(items) + [FIXATION, QUESTION]:
+        if item not in cache:
+            if item in previous:
+                cache[item] = previous[item]
+            else:
+                cache[item] = font.render(item, False, colour).convert()
+
+    return cache
+
@@ -0,0 +1,341 @@
+# Participant input for the working memory removal task.
+
+# Polling pygame.event.get in a tight loop keeps a CPU core busy for the whole
+
+# session. Waiting here blocks in SDL until an event arrives, and only the
+
+# last few ms before a deadline are spent polling, so timeouts stay precise.
+
+# Every wait says what the task is waiting for, so a simulated participant
+
+# can be plugged in as the source of events instead of the keyboard.
+
+# Every key press read during a session, including those left queued from
+
+# before a prompt, goes into a preallocated KeyBuffer with its time. Typed
+
+# responses are decoded from the buffer rather than from the events of a
+
+# single wait, so no keystroke is dropped between screens, and the buffer is
+
+# written out to <pid>keys.csv with the latency of every key press.
+
+# Key presses left queued are recorded when the queue is drained before the
+
+# next prompt. Without an SDL timestamp that is the only time known for them,
+
+# which can be up to a cue interval after the press, so keys.csv gives NaN
+
+# for the time, latency and interval of those early presses.
+
+import numpy, pygame
+import audit, markers, results, timing
+
+CAPACITY = 1 << 12  # key presses kept between dumps
+
+# prompts a wait can be for
+CONTINUE = 'continue'  # space to leave an instruction screen
+CONFIRM = 'confirm'  # any key to confirm an update was encoded
+ENTRY = 'entry'  # participant ID typed and entered with return
+RECALL = 'recall'  # the keys of a tested stimulus
+EARLY = 'early'  # pressed before the prompt it was queued for
+
+PROMPTS = [CONTINUE, CONFIRM, ENTRY, RECALL, EARLY]
+SOURCES = ['perf', 'sdl']
+
+source = None  # object with an events method replacing the keyboard
+active_buffer = None  # KeyBuffer that key presses are recorded in, or None
+
+
+class KeyBuffer(results.RingLog):
+    """
+    This class records every key press of a session into a ring buffer.
+
+    Attributes:
+    scheduler - Scheduler whose clock and epoch key presses are timed on
+    """
+
+    def __init__(self, scheduler, capacity=CAPACITY):
+        super().__init__(capacity)
+        self.scheduler = scheduler
+        self.times = numpy.zeros(capacity, dtype=numpy.int64)
+        self.onsets = numpy.zeros(capacity, dtype=numpy.int64)
+        self.keys = numpy.zeros(capacity, dtype=numpy.int32)
+        self.prompts = numpy.zeros(capacity, dtype=numpy.int8)
+        self.sources = numpy.zeros(capacity, dtype=numpy.int8)
+        self.events = [None]*capacity
+        self.onset_ns = -1
+
+    def record(self, event, prompt):
+        """
+        This function adds a key press to the buffer, timed as it is read.
+
+        Parameters:
+        event, prompt - pygame KEYDOWN event, one of PROMPTS
+
+        Returns:
+        t_ns - clock time of the key press in ns
+        """
+
+        i = self.slot()
+        t_ns, source = self.scheduler.event_time(event)
+        self.times[i] = t_ns
+        self.onsets[i] = self.onset_ns
+        self.keys[i] = event.key
+        self.prompts[i] = PROMPTS.index(prompt)
+        self.sources[i] = SOURCES.index(source)
+        self.events[i] = event
+
+        return t_ns
+
+    def mark(self, onset_ns=None):
+        """
+        This function starts a response: later key presses are timed from
+
+        the onset given.
+
+        Parameters:
+        onset_ns - onset of the prompt in ns, or None if it has no onset
+
+        Returns:
+        mark - position of the next key press, to pass to since
+        """
+
+        self.onset_ns = -1 if onset_ns is None else onset_ns
+        return self.recorded
+
+    def since(self, mark):
+        """
+        This function lists the key presses recorded after a mark.
+
+        Parameters:
+        mark - value returned by mark
+
+        Returns:
+        presses - list of (event, t_ns, source) in the order they were read
+        """
+
+        start = max(mark, self.recorded - self.capacity)
+        return [(self.events[i % self.capacity],
+                 int(self.times[i % self.capacity]),
+                 SOURCES[self.sources[i % self.capacity]])
+                for i in range(start, self.recorded)]
+
+    def time_of(self, event, mark):
+        """
+        This function finds when a key press read after a mark was recorded,
+
+        so reaction times use the same time as the buffer and keys.csv.
+
+        Parameters:
+        event, mark - pygame KEYDOWN event returned by wait_events, value
+
+        returned by mark
+
+        Returns:
+        t_ns, source - clock time of the key press in ns, 'sdl' or 'perf'
+        """
+
+        for press, t_ns, source in reversed(self.since(mark)):
+            if press is event:
+                return t_ns, source
+
+        raise ValueError('key press was not recorded after the mark')
+
+    def open(self, prefix):
+        """
+        This function opens the file the key presses are dumped to.
+
+        Parameters:
+        prefix - path and participant ID that the file name starts with
+        """
+
+        self.open_file(prefix+'keys.csv', 'Time_us: Key: Char: Prompt: '
+                       'Source: Latency_us: Interval_us:')
+
+    def text(self, start, stop):
+        # each key press with the time from the prompt onset and from the
+        # previous key
+        rows = []
+        for n in range(start, stop):
+            i = n % self.capacity
+            previous = (n - 1) % self.capacity
+            timed = self._timed(i)
+            char = self.events[i].unicode
+            rows.append(' '.join([
+                str(self.scheduler.to_us(self.times[i])) if timed else 'NaN',
+                pygame.key.name(int(self.keys[i])).replace(' ', '_') or 'NaN',
+                char if char.isprintable() and char.strip() else 'NaN',
+                PROMPTS[self.prompts[i]], SOURCES[self.sources[i]],
+                str((self.times[i] - self.onsets[i])//1000)
+                if timed and self.onsets[i] >= 0 else 'NaN',
+                str((self.times[i] - self.times[previous])//1000)
+                if timed and n > 0 and n > self.recorded - self.capacity and
+                self._timed(previous) else 'NaN'])
+                + '\n')
+        return ''.join(rows)
+
+    def _timed(self, i):
+        # False for early key presses only stamped when they were drained
+        return (self.prompts[i] != PROMPTS.index(EARLY) or
+                SOURCES[self.sources[i]] == 'sdl')
+
+
+def dump():
+    """
+    This function writes out the active buffer's key presses, e.g. after a
+
+    block, if there is an active buffer.
+    """
+
+    if active_buffer is not None:
+        active_buffer.dump()
+
+
+def close():
+    """
+    This function closes the active buffer, if there is one, and turns it
+
+    off.
+
+    Returns:
+    lost - number of key presses overwritten before they were written out
+    """
+
+    global active_buffer
+    if active_buffer is None:
+        return 0
+
+    active_buffer.close()
+    lost, active_buffer = active_buffer.lost, None
+    return lost
+
+
+def drain(onset_ns=None):
+    """
+    This function empties the event queue before a prompt. Key presses in it
+
+    are recorded as early rather than dropped, and later ones are timed from
+
+    the onset of the prompt.
+
+    Parameters:
+    onset_ns - onset of the prompt in ns, or None if it has no onset
+
+    Returns:
+    mark - KeyBuffer.mark of the prompt, None if there is no active buffer
+    """
+
+    for event in pygame.event.get():
+        if event.type == pygame.KEYDOWN and active_buffer is not None:
+            active_buffer.record(event, EARLY)
+
+    if active_buffer is not None:
+        return active_buffer.mark(onset_ns)
+
+
+def typed(presses, length=None):
+    """
+    This function decodes a typed entry from key presses. Letters and digits
+
+    are appended, backspace deletes the last one, and the entry is complete
+
+    when it reaches the length or, without a length, on return.
+
+    Parameters:
+    presses, length - list of (event, t_ns, source) as from KeyBuffer.since,
+
+    number of characters which complete the entry or None
+
+    Returns:
+    text, done - characters entered, the (event, t_ns, source) which
+
+    completed the entry or None if it is not complete
+    """
+
+    text = ''
+    for press in presses:
+        event = press[0]
+        if event.unicode.isalpha() or event.unicode.isnumeric():
+            text += event.unicode
+            if length is not None and len(text) >= length:
+                return text, press
+        elif event.key == pygame.K_BACKSPACE:
+            text = text[:-1]
+        elif length is None and event.key == pygame.K_RETURN and text:
+            return text, press
+
+    return text, None
+
+
+def setup():
+    """
+    This function stops SDL from queueing events the task never reads, so
+
+    mouse movement and window events do not wake up a blocked wait.
+    """
+
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed([pygame.KEYDOWN, pygame.QUIT])
+
+
+def wait_events(deadline_ns=None, prompt=CONTINUE, answer=None):
+    """
+    This function blocks until at least one event is queued or a deadline
+
+    passes, without spinning on the event queue. When a source is set the
+
+    events come from it instead.
+
+    Parameters:
+    deadline_ns, prompt, answer - optional timing.active_clock time to stop
+
+    waiting at, what the task is waiting for, keys the task scores as correct
+
+    for a RECALL prompt
+
+    Returns:
+    events - list of every queued event, empty if the deadline passed
+    """
+
+    if source is not None:
+        events = source.events(deadline_ns, prompt, answer)
+    else:
+        events = _wait_keyboard(deadline_ns)
+
+    for event in events:
+        if event.type == pygame.KEYDOWN:
+            if active_buffer is not None:
+                t_ns = active_buffer.record(event, prompt)
+            else:
+                t_ns = timing.active_clock.now()
+            if prompt in (CONFIRM, RECALL):
+                markers.emit('response', t_ns, pygame.key.name(event.key))
+
+    if audit.active_log is not None:
+        for event in events:
+            if event.type == pygame.KEYDOWN:
+                audit.record('keydown', pygame.key.name(event.key))
+        if not events:
+            audit.record('timeout', prompt)
+
+    return events
+
+
+def _wait_keyboard(deadline_ns):
+    if deadline_ns is None:
+        return [pygame.event.wait()] + pygame.event.get()
+
+    while True:
+        remaining_ms = (deadline_ns - timing.active_clock.now())//1000000
+
+        if remaining_ms > timing.SPIN_MS:
+            event = pygame.event.wait(remaining_ms - timing.SPIN_MS)
+        else:
+            event = pygame.event.poll()
+            if event.type == pygame.NOEVENT and \
+               timing.active_clock.now() >= deadline_ns:
+                return []
+
+        if event.type != pygame.NOEVENT:
+            return [event] + pygame.event.get()
@@ -0,0 +1,329 @@
+# Event markers for running the working memory removal task alongside EEG or
+
+# eye-tracking acquisition.
+
+# Every onset the Scheduler presents (cue, update, test and so on) and every
+
+# response key press is sent as a one line marker to the sinks named by the
+
+# markers config option: a UDP socket, a named pipe or a file. Delivery runs
+
+# as asyncio coroutines on an event loop in a background thread, one task per
+
+# sink, so a slow or absent recorder never holds up the display path. The
+
+# task's thread only stamps the marker with the time of the event on the
+
+# task's clock and hands it to the loop.
+
+# Markers are lines of "<seq> <label> <detail> <time_us>", e.g.
+
+# "12 cue NaN 5321904211", where seq counts up from 0 so lost UDP packets can
+
+# be spotted and time_us is the task clock (time.perf_counter_ns) in us.
+
+# python markers.py listen [port] prints the markers sent to a UDP port, as
+
+# a stand-in for the recorder.
+
+import asyncio, os, socket, sys, threading, time
+
+PORT = 5005  # UDP port of the recorder when the spec gives none
+STOP_TIMEOUT = 2  # s to wait for sinks to deliver their markers at the end
+
+active_emitter = None  # MarkerEmitter that emit sends to, None when off
+
+
+class FileSink:
+    """
+    This class appends markers to a file, unbuffered. Every sink has the
+
+    coroutines open, send and close, which run on the emitter's loop.
+
+    Attributes:
+    path - file name
+
+    sent, dropped - number of markers delivered and lost
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sent = 0
+        self.dropped = 0
+        self.file = None
+
+    async def open(self):
+        self.file = open(self.path, 'ab', buffering=0)
+
+    async def send(self, data):
+        self.file.write(data)
+
+    async def close(self):
+        self.file.close()
+
+
+class PipeSink(FileSink):
+    """
+    This class writes markers to a named pipe created by the recorder (a
+
+    fifo on Linux and macOS, \\\\.\\pipe\\name on Windows). The pipe is opened
+
+    when the first marker is sent, and again after the reader goes away.
+
+    Markers sent while no reader is connected are dropped.
+    """
+
+    async def open(self):
+        self.fd = None
+
+    async def send(self, data):
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_WRONLY |
+                              getattr(os, 'O_NONBLOCK', 0))
+        try:
+            os.write(self.fd, data)
+        except OSError:
+            os.close(self.fd)
+            self.fd = None
+            raise
+
+    async def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+
+
+class UdpSink(FileSink):
+    """
+    This class sends every marker as one UDP datagram.
+
+    Attributes:
+    address - (host, port) of the recorder
+    """
+
+    def __init__(self, host, port=PORT):
+        super().__init__(host+':'+str(port))
+        self.address = (host, port)
+
+    async def open(self):
+        self.transport, _ = await asyncio.get_running_loop(
+            ).create_datagram_endpoint(asyncio.DatagramProtocol,
+                                       remote_addr=self.address)
+
+    async def send(self, data):
+        self.transport.sendto(data)
+
+    async def close(self):
+        self.transport.close()
+
+
+def from_spec(spec, directory='.'):
+    """
+    This function creates the sinks named by a markers config option.
+
+    Parameters:
+    spec, directory - space separated sinks, each udp:host[:port],
+
+    pipe:path or file:path, directory relative file paths are read from
+
+    Returns:
+    sinks - list of sink objects
+    """
+
+    sinks = []
+    for item in spec.split():
+        kind, _, target = item.partition(':')
+        if kind == 'udp':
+            host, _, port = target.partition(':')
+            sinks.append(UdpSink(host or '127.0.0.1', int(port or PORT)))
+        elif kind == 'pipe':
+            sinks.append(PipeSink(target))
+        elif kind == 'file':
+            sinks.append(FileSink(os.path.join(directory, target)))
+        else:
+            raise ValueError('unknown marker sink '+item)
+
+    return sinks
+
+
+class MarkerEmitter:
+    """
+    This class runs an asyncio event loop on a background thread which
+
+    delivers markers to every sink.
+
+    Attributes:
+    sinks - list of sinks the markers are sent to
+
+    emitted - number of markers handed to the loop
+    """
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+        self.emitted = 0
+        self.loop = asyncio.new_event_loop()
+        self._error = None
+        self._queues = []
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self.loop.run_until_complete,
+                                         args=(self._serve(),),
+                                         name='markers', daemon=True)
+
+    def start(self):
+        """
+        This function starts the loop and waits until every sink is open,
+
+        raising the error of a sink which could not be opened.
+        """
+
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            raise self._error
+
+    def emit(self, label, t_ns, detail=None):
+        """
+        This function hands a marker to the loop without waiting for it.
+
+        Parameters:
+        label, t_ns, detail - name of the event, clock time of the event in
+
+        ns, optional extra field such as the key pressed
+        """
+
+        data = (str(self.emitted)+' '+label+' ' +
+                ('NaN' if detail is None else str(detail).replace(' ', '_')) +
+                ' '+str(t_ns//1000)+'\n').encode()
+        self.emitted += 1
+        for markers in self._queues:
+            self.loop.call_soon_threadsafe(markers.put_nowait, data)
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """
+        This function lets every sink deliver its markers, closes the sinks
+
+        and ends the loop, giving up after a timeout.
+        """
+
+        for markers in self._queues:
+            self.loop.call_soon_threadsafe(markers.put_nowait, None)
+        self._thread.join(timeout)
+
+    async def _serve(self):
+        self._queues = [asyncio.Queue() for sink in self.sinks]
+        try:
+            for sink in self.sinks:
+                await sink.open()
+        except OSError as error:
+            self._error = error
+            return
+        finally:
+            self._ready.set()
+
+        await asyncio.gather(*[self._deliver(sink, markers) for sink, markers
+                               in zip(self.sinks, self._queues)])
+
+    async def _deliver(self, sink, markers):
+        while True:
+            data = await markers.get()
+            if data is None:
+                break
+            try:
+                await sink.send(data)
+                sink.sent += 1
+            except OSError:  # e.g. no reader on the pipe or nobody listening
+                sink.dropped += 1
+        await sink.close()
+
+
+class UdpListener:
+    """
+    This class stands in for a recorder: it collects the markers sent to a
+
+    local UDP port on a background thread.
+
+    Attributes:
+    port - port listened on, a free one if 0 was given
+
+    received - list of the marker lines received
+    """
+
+    def __init__(self, port=0, host='127.0.0.1'):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.port = self.socket.getsockname()[1]
+        self.received = []
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.socket.close()
+
+    def _listen(self):
+        while True:
+            try:
+                data = self.socket.recv(4096)
+            except OSError:
+                return
+            self.received.append(data.decode().rstrip('\n'))
+
+
+def emit(label, t_ns, detail=None):
+    """
+    This function sends a marker with the active emitter, if there is one.
+
+    Parameters:
+    label, t_ns, detail - as for MarkerEmitter.emit
+    """
+
+    if active_emitter is not None:
+        active_emitter.emit(label, t_ns, detail)
+
+
+def run_session(session, sinks):
+    """
+    This function runs a session of the task while its markers are sent to
+
+    the sinks.
+
+    Parameters:
+    session, sinks - engine.Session which is not started yet, list of sinks
+
+    Returns:
+    emitter - the stopped MarkerEmitter, holding the delivery counts
+    """
+
+    global active_emitter
+    emitter = MarkerEmitter(sinks)
+    emitter.start()
+    active_emitter = emitter
+    try:
+        session.start()
+        session.run_experiment()
+    finally:  # also when the participant escapes
+        active_emitter = None
+        emitter.stop()
+
+    return emitter
+
+
+def main(argv=None):
+    args = argv if argv is not None else sys.argv[1:]
+    if not args or args[0] != 'listen':
+        sys.exit('usage: python markers.py listen [port]')
+
+    listener = UdpListener(int(args[1]) if len(args) > 1 else PORT)
+    print('listening on udp port', listener.port)
+    printed = 0
+    try:
+        while True:
+            time.sleep(0.1)
+            for line in listener.received[printed:]:
+                print(line)
+            printed = len(listener.received)
+    except KeyboardInterrupt:
+        listener.close()
+
+
+if __name__ == '__main__':
+    main()
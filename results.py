@@ -0,0 +1,526 @@
+# Result files for the working memory removal task.
+
+# Rows are kept as typed records in memory while a block runs and handed to a
+
+# background thread once the block is over, so no file I/O happens during
+
+# timed intervals. Every block is fsynced before the next one is written, so
+
+# a crash loses at most the block that was running.
+
+# All file writes of a session, including the audit and key press logs, go
+
+# through one WriterThread. Handing over a write only appends it to a queue
+
+# under a lock and never waits for the disk; the thread takes every write off
+
+# the queue itself as soon as it is free. Writes beyond the queue's bound are
+
+# still taken, since they hold records which must not be lost, but counted
+
+# as backpressure. The thread is drained when the session is saved, on
+
+# escape, and at interpreter exit.
+
+# The text files are space separated strings. At the end of a session the same
+
+# records are also saved as typed columns in one NumPy .npz file, for analyses
+
+# in Python which want the onsets and reaction times without parsing text.
+
+# scoring.py reads the text files, so those stay the record every session
+
+# has. load_session reads a .npz back into records and write_text turns it
+
+# back into the text files, or with --legacy into the ms text files of the
+
+# original task which older aggregation jobs parse:
+
+# python results.py <session.npz> [output prefix] [--legacy]
+
+import atexit, collections, os, sys, threading, time
+import numpy
+
+UpdateRecord = collections.namedtuple(
+    'UpdateRecord', ['block', 'step', 'rt_us', 'rt_source', 'delay',
+                     'cue_planned', 'cue_onset', 'update_planned',
+                     'update_onset'])
+
+MemoryRecord = collections.namedtuple(
+    'MemoryRecord', ['block', 'accuracy', 'rt_us', 'rt_source', 'response',
+                     'stimulus', 'onset', 'frame'])
+
+HEADERS = {
+    UpdateRecord: 'Block: Step: RT_us: RT_source: Delay: Cue_planned: '
+                  'Cue_onset: Update_planned: Update_onset:',
+    MemoryRecord: 'Block: Accuracy: RT_us: RT_source: Response: Stimulus: '
+                  'Onset:',
+}
+
+# headers and fields of the original task's text files, with RT in ms
+LEGACY_HEADERS = {
+    UpdateRecord: 'Block: Step: RT: Delay:',
+    MemoryRecord: 'Block: Accuracy: RT: Response: Stimulus:',
+}
+LEGACY_FIELDS = {
+    UpdateRecord: ('block', 'step', 'rt_us', 'delay'),
+    MemoryRecord: ('block', 'accuracy', 'rt_us', 'response', 'stimulus'),
+}
+
+# fields written to the text files, in header order
+TEXT_FIELDS = {
+    UpdateRecord: UpdateRecord._fields,
+    MemoryRecord: MemoryRecord._fields[:-1],
+}
+
+# name prefix of each record type's columns in the .npz and its text suffix
+PREFIXES = {UpdateRecord: 'upd', MemoryRecord: 'mem'}
+
+# column dtypes, rt_us is a float so that timeouts can be stored as NaN
+DTYPES = {
+    'block': numpy.int32, 'step': numpy.int32, 'frame': numpy.int32,
+    'rt_us': numpy.float64, 'rt_source': str, 'delay': numpy.int32,
+    'cue_planned': numpy.int64, 'cue_onset': numpy.int64,
+    'update_planned': numpy.int64, 'update_onset': numpy.int64,
+    'accuracy': numpy.bool_, 'response': str, 'stimulus': str,
+    'onset': numpy.int64,
+}
+
+QUEUE_SIZE = 256  # writes waiting at once before they count as over bound
+
+active_writer = None  # WriterThread of the running session
+
+
+class WriterThread(threading.Thread):
+    """
+    This class runs file writes on a background thread, in the order they
+
+    were submitted.
+
+    Attributes:
+    size - bound of the queue, writes waiting beyond it count as over bound
+
+    submitted, over_bound - number of writes submitted, and of those which
+
+    found the queue at its bound
+
+    max_depth - largest number of writes waiting or running at once
+
+    lags_ns - time from submitting each finished write until it was done
+    """
+
+    def __init__(self, size=QUEUE_SIZE):
+        super().__init__(name='result writer', daemon=True)
+        self.size = size
+        self.jobs = collections.deque()
+        self.pending = 0  # writes submitted and not finished yet
+        self.condition = threading.Condition()
+        self.submitted = 0
+        self.over_bound = 0
+        self.max_depth = 0
+        self.lags_ns = []
+        self.errors = []
+        self._stopping = False
+
+    def submit(self, function, *args):
+        """
+        This function queues a write without waiting for the thread.
+
+        Parameters:
+        function, args - function to call on the writer thread, its arguments
+        """
+
+        with self.condition:
+            if self.pending >= self.size:
+                self.over_bound += 1
+            self.jobs.append((time.perf_counter_ns(), function, args))
+            self.submitted += 1
+            self.pending += 1
+            self.max_depth = max(self.max_depth, self.pending)
+            self.condition.notify_all()
+
+    def wait(self):
+        """
+        This function blocks until every write submitted so far is done, and
+
+        raises the first error a write ran into.
+        """
+
+        with self.condition:
+            while self.pending:
+                self.condition.wait()
+
+        if self.errors:
+            raise self.errors.pop(0)
+
+    def stop(self):
+        """
+        This function finishes every submitted write and ends the thread.
+        """
+
+        try:
+            self.wait()
+        finally:
+            with self.condition:
+                self._stopping = True
+                self.condition.notify_all()
+            self.join()
+
+    def write_stats(self, path, counts=()):
+        """
+        This function writes the backpressure measures of the queue to file.
+
+        Parameters:
+        path, counts - file name of the measures, further (measure, count)
+
+        rows to write with them
+        """
+
+        lags = numpy.asarray(self.lags_ns)/1000
+        with open(path, 'w') as file:
+            file.write('Measure: Count: Mean_us: Max_us:\n')
+            file.write('write_lag '+str(len(lags))+' ' +
+                       (str(round(lags.mean(), 1))+' ' +
+                        str(round(lags.max(), 1)) if len(lags)
+                        else 'NaN NaN')+'\n')
+            file.write('max_queue_depth '+str(self.max_depth)+' NaN NaN\n')
+            file.write('writes_over_bound '+str(self.over_bound)+' NaN NaN\n')
+            for measure, count in counts:
+                file.write(measure+' '+str(count)+' NaN NaN\n')
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.jobs and not self._stopping:
+                    self.condition.wait()
+                if not self.jobs:
+                    return
+                submitted_ns, function, args = self.jobs.popleft()
+
+            try:
+                function(*args)
+            except Exception as error:  # raised again on the task's thread
+                self.errors.append(error)
+
+            with self.condition:
+                self.lags_ns.append(time.perf_counter_ns() - submitted_ns)
+                self.pending -= 1
+                self.condition.notify_all()
+
+
+def background():
+    """
+    This function returns the session's writer thread, starting one if none
+
+    is running.
+
+    Returns:
+    writer - running WriterThread
+    """
+
+    global active_writer
+    if active_writer is None:
+        active_writer = WriterThread()
+        active_writer.start()
+
+    return active_writer
+
+
+def drain(stats_path=None, counts=()):
+    """
+    This function waits until every submitted write is done and stops the
+
+    writer thread, if one is running.
+
+    Parameters:
+    stats_path, counts - optional file name to write the queue's measures
+
+    to, further (measure, count) rows for that file
+    """
+
+    global active_writer
+    if active_writer is not None:
+        writer, active_writer = active_writer, None
+        writer.stop()
+        if stats_path is not None:
+            writer.write_stats(stats_path, counts)
+
+
+atexit.register(drain)  # writes still queued when the task exits are kept
+
+
+class RingLog:
+    """
+    This class is the base of the logs which the task records into during
+
+    timed intervals, the audit EventLog and the KeyBuffer of inputs.py. A
+
+    subclass keeps its columns in preallocated NumPy arrays used as a ring
+
+    buffer, so a record is a few array stores with no lock and no file I/O,
+
+    and turns the rows recorded since the last dump into text, which is
+
+    written out through the writer thread.
+
+    Attributes:
+    capacity - rows kept between dumps, older ones are overwritten
+
+    recorded, dumped - number of rows recorded and written out so far
+
+    lost - number of rows overwritten before they could be written out
+
+    file - open text file, None until open_file is called
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.recorded = 0
+        self.dumped = 0
+        self.lost = 0
+        self.file = None
+
+    def open_file(self, path, header):
+        """
+        This function opens the file the rows are dumped to.
+
+        Parameters:
+        path, header - file name, header line without its newline
+        """
+
+        self.file = open(path, 'w')
+        background().submit(self._write, header+'\n')
+
+    def slot(self):
+        """
+        This function claims the array index of the next row.
+
+        Returns:
+        i - index to store the row's columns at
+        """
+
+        i = self.recorded % self.capacity
+        self.recorded += 1
+        return i
+
+    def dump(self):
+        """
+        This function writes the rows recorded since the last dump to file.
+        """
+
+        if self.file is None:
+            return
+
+        start = max(self.dumped, self.recorded - self.capacity)
+        self.lost += start - self.dumped
+        text = self.text(start, self.recorded)
+        background().submit(self._write, text)
+        self.dumped = self.recorded
+
+    def text(self, start, stop):
+        """
+        This function formats rows for the file, implemented by subclasses.
+
+        Parameters:
+        start, stop - number of the first row and one past the last, still
+
+        in the buffer at index number % capacity
+
+        Returns:
+        text - the rows' lines
+        """
+
+        raise NotImplementedError
+
+    def close(self):
+        """
+        This function dumps the remaining rows and closes the file.
+        """
+
+        self.dump()
+        if self.file is not None:
+            background().submit(self.file.close)
+
+    def _write(self, text):
+        self.file.write(text)
+        self.file.flush()
+
+
+class ResultWriter:
+    """
+    This class buffers the records of one results file and hands them to
+
+    the writer thread whenever a block ends.
+    """
+
+    def __init__(self, path, record_type):
+        self.path = path
+        self.record_type = record_type
+        self.records = []  # every record of the session, for save_session
+        self.file = None
+        self._buffer = []
+        self._background = background()
+        self._background.submit(self._open)
+
+    def append(self, record):
+        """
+        This function adds a record to the current block. Nothing is written.
+
+        Parameters:
+        record - record of this writer's record_type
+        """
+
+        self.records.append(record)
+        self._buffer.append(record)
+
+    def flush_block(self):
+        """
+        This function hands the records of the finished block to the writer
+
+        thread, which writes and fsyncs them.
+        """
+
+        rows, self._buffer = self._buffer, []
+        if rows:
+            self._background.submit(self._write, rows)
+
+    def wait(self):
+        """
+        This function blocks until every block handed over has reached disk.
+        """
+
+        self._background.wait()
+
+    def close(self):
+        """
+        This function hands over any remaining records and the closing of the
+
+        file. drain waits for both.
+        """
+
+        self.flush_block()
+        self._background.submit(self._close)
+
+    def _open(self):
+        self.file = open(self.path, 'w')
+        self.file.write(HEADERS[self.record_type]+'\n')
+        self._sync()
+
+    def _write(self, rows):
+        self.file.write(''.join(_text_row(row) for row in rows))
+        self._sync()
+
+    def _close(self):
+        self.file.close()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+
+def _text_row(record):
+    fields = [getattr(record, name) for name in TEXT_FIELDS[type(record)]]
+    return ' '.join(map(str, fields))+'\n'
+
+
+def save_session(path, *writers):
+    """
+    This function saves the records of a session as typed columns with a
+
+    single numpy.savez call. Columns are named prefix_field, e.g. upd_rt_us.
+
+    Parameters:
+    path, writers - .npz file name, ResultWriters holding the session records
+    """
+
+    columns = {}
+    for writer in writers:
+        prefix = PREFIXES[writer.record_type]
+        for i, name in enumerate(writer.record_type._fields):
+            values = [record[i] for record in writer.records]
+            if DTYPES[name] is str:
+                values = [str(value) for value in values]
+            columns[prefix+'_'+name] = numpy.array(values, dtype=DTYPES[name])
+
+    numpy.savez(path, **columns)
+
+
+def load_session(path):
+    """
+    This function reads a session saved by save_session back into records.
+
+    Parameters:
+    path - .npz file name
+
+    Returns:
+    records - dictionary mapping each record type to its list of records
+    """
+
+    records = {}
+    with numpy.load(path) as data:
+        for record_type, prefix in PREFIXES.items():
+            columns = [data[prefix+'_'+name].tolist()
+                       for name in record_type._fields]
+            records[record_type] = [record_type(*row) for row in zip(*columns)]
+
+    return records
+
+
+def write_text(path, prefix=None, legacy=False):
+    """
+    This function converts a saved session into the space separated upd.csv
+
+    and mem.csv text files written during the task.
+
+    Parameters:
+    path, prefix, legacy - .npz file name, start of the output file names,
+
+    by default the .npz file name without its extension, boolean stating
+
+    whether to write the original task's layout with RT in ms
+
+    Returns:
+    written - list of the text file names
+    """
+
+    if prefix is None:
+        prefix = os.path.splitext(path)[0]
+
+    written = []
+    for record_type, records in load_session(path).items():
+        if legacy:
+            header = LEGACY_HEADERS[record_type]
+            rows = [' '.join(str(getattr(record, name)) for name
+                             in LEGACY_FIELDS[record_type])+'\n' for record
+                    in _with_text_rts(records, 1000)]
+        else:
+            header = HEADERS[record_type]
+            rows = [_text_row(record) for record
+                    in _with_text_rts(records, 1)]
+
+        name = prefix+PREFIXES[record_type]+'.csv'
+        with open(name, 'w') as file:
+            file.write(header+'\n')
+            file.write(''.join(rows))
+        written.append(name)
+
+    return written
+
+
+def _with_text_rts(records, unit_us):
+    # records with rt_us as whole units of unit_us, the way the text files
+    # hold them
+    return [record._replace(rt_us=_text_rt(record.rt_us, unit_us))
+            for record in records]
+
+
+def _text_rt(rt_us, unit_us=1):
+    # reaction times are whole us, the column is float only to hold the NaN
+
+    # written for timeouts, which is the one value that does not equal itself
+    return int(rt_us)//unit_us if rt_us == rt_us else 'NaN'
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--legacy']
+    print('\n'.join(write_text(*args[:2], legacy='--legacy' in sys.argv)))
@@ -0,0 +1,154 @@
+# Constant-time samplers for the stimulus sets of the working memory removal
+
+# task. Nothing here loops until a draw happens to satisfy a rule; the valid
+
+# draws are counted up front and sampled from directly.
+
+import numpy
+
+
+class StartSampler:
+    """
+    This class draws sets of three starting item indices which are at least
+
+    `spacing` positions apart in the stimulus set. With `wrap` the set is
+
+    treated as a circle and, as in the original get_start_letters rejection
+
+    loop, the gap across the wraparound must be one position larger.
+
+    Every valid set is equally likely and is returned in a random order, which
+
+    is the same distribution the rejection loop produced, but each draw costs
+
+    the same fixed time however tight the rule is.
+    """
+
+    def __init__(self, n_items, spacing=2, wrap=True):
+        spacing = max(spacing, 1)
+        self.n_items = n_items
+        self.spacing = spacing
+        self.wrap = wrap
+
+        # shifting b down by spacing-1 and c by 2*(spacing-1) maps valid sets
+        # a < b < c onto plain 3-combinations of range(m) whose span c-a is
+        # limited only by the wraparound rule
+        m = n_items - 2*(spacing - 1)
+        max_span = m - spacing - 1 if wrap else m - 1
+        spans = numpy.arange(2, max(max_span, 1) + 1)
+        weights = (m - spans)*(spans - 1)  # first item x middle item choices
+
+        if len(spans) == 0 or weights.sum() <= 0:
+            raise ValueError('no valid start sets for %d items with spacing %d'
+                             % (n_items, spacing))
+
+        self._m = m
+        self._spans = spans
+        self._p = weights/weights.sum()
+        self.n_sets = int(weights.sum())
+
+    def draw_batch(self, n, rng):
+        """
+        This function draws n start sets at once.
+
+        Parameters:
+        n, rng - number of start sets to draw, numpy Generator
+
+        Returns:
+        sets - (n, 3) array of item indices in presentation order
+        """
+
+        span = rng.choice(self._spans, size=n, p=self._p)
+        first = rng.integers(0, self._m - span)
+        middle = first + rng.integers(1, span)
+        shift = self.spacing - 1
+        sets = numpy.stack([first, middle + shift, first + span + 2*shift],
+                           axis=1)
+
+        return rng.permuted(sets, axis=1)
+
+    def draw(self, rng):
+        """
+        This function draws a single start set.
+
+        Parameters:
+        rng - numpy Generator
+
+        Returns:
+        sample - array of three item indices in presentation order
+        """
+
+        return self.draw_batch(1, rng)[0]
+
+
+class GroupSampler:
+    """
+    This class draws item indices uniformly from the items whose group is not
+
+    excluded. Items in a group share the key they are scored by, such as the
+
+    first three letters of a word, so a sample holding one item of each group
+
+    can always be scored unambiguously.
+
+    The items are sorted by group once, which makes the items of any excluded
+
+    groups a few runs of positions. A draw picks a position among the other
+
+    items and steps it over those runs, so it costs the same small time for
+
+    a stimulus set of any size.
+    """
+
+    def __init__(self, groups):
+        groups = numpy.asarray(groups, dtype=numpy.intp)
+        sizes = numpy.bincount(groups)
+        self.groups = groups
+        self.n_items = len(groups)
+        self.n_groups = int(numpy.count_nonzero(sizes))
+        self._order = numpy.argsort(groups, kind='stable')
+        self._sizes = sizes.tolist()
+        self._starts = (numpy.cumsum(sizes) - sizes).tolist()
+
+        if self.n_groups < 3:
+            raise ValueError('only %d distinct groups, a sample needs 3'
+                             % self.n_groups)
+
+    def draw(self, excluded, rng):
+        """
+        This function draws one item outside the excluded groups.
+
+        Parameters:
+        excluded, rng - iterable of group ids, numpy Generator
+
+        Returns:
+        item - item index
+        """
+
+        runs = sorted(set(int(group) for group in excluded))
+        position = int(rng.integers(self.n_items -
+                                    sum(self._sizes[group] for group in runs)))
+        for group in runs:  # runs lie in the sorted order by group id
+            if position >= self._starts[group]:
+                position += self._sizes[group]
+
+        return self._order[position]
+
+    def draw_start(self, rng):
+        """
+        This function draws a starting sample of three items from three
+
+        different groups, each uniformly from the groups not yet drawn.
+
+        Parameters:
+        rng - numpy Generator
+
+        Returns:
+        sample - array of three item indices in presentation order
+        """
+
+        sample = numpy.empty(3, dtype=numpy.intp)
+        for frame in range(3):
+            sample[frame] = self.draw(self.groups[sample[:frame]], rng)
+
+        return sample
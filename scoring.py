@@ -0,0 +1,354 @@
+# Study level scoring for the working memory removal task.
+
+# Every session leaves a <pid>upd.csv and a <pid>mem.csv next to the task
+
+# script. This module finds all of them below the given directories, parses
+
+# each session with numpy in a pool of worker processes and writes a single
+
+# tidy table with one row per participant and block, plus one row per
+
+# participant with block 'all' scoring the whole session.
+
+# Columns are found by their header names, so session files written before
+
+# the timing rework (Block: Step: RT: Delay:, reaction times in ms) are scored
+
+# alongside newer ones in us. A session which cannot be scored is reported
+
+# and left out instead of stopping the run.
+
+# The rows of every scored session are kept in a JSON cache next to the
+
+# output, keyed by the path, size, mtime and SHA-256 of its two files, so a
+
+# rerun only parses sessions that are new or have changed.
+
+# python scoring.py [directory ...] [-o scores.csv] [-j workers] [--no-cache]
+
+import argparse, concurrent.futures, csv, hashlib, json, os, sys
+import numpy
+import trial_schedule
+
+LONG_DELAY, SHORT_DELAY = trial_schedule.CUE_DELAYS
+
+COLUMNS = ['task', 'pid', 'block', 'updates', 'rt_long_us', 'rt_short_us',
+           'removal_us', 'tests', 'accuracy']
+
+
+def find_sessions(directories):
+    """
+    This function finds every updating results file below some directories.
+
+    Parameters:
+    directories - list of directory paths to search
+
+    Returns:
+    paths - sorted list of <pid>upd.csv paths
+    """
+
+    paths = []
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            paths.extend(os.path.join(root, name) for name in files
+                         if name.endswith('upd.csv'))
+
+    return sorted(paths)
+
+
+def read_table(path):
+    """
+    This function reads a space separated results file into columns of
+
+    strings. Empty fields, e.g. a timed out word response, are kept. Older
+
+    sessions wrote key names such as "left shift" with their space, so the
+
+    extra fields of a longer row are joined back into its Response.
+
+    Parameters:
+    path - results file name
+
+    Returns:
+    columns - dictionary mapping each header field, without its colon, to a
+
+    string array
+    """
+
+    with open(path) as file:
+        header, *lines = file.read().splitlines()
+
+    names = [field.rstrip(':') for field in header.split()]
+    rows = [line.split(' ') for line in lines]
+    if 'Response' in names:
+        i = names.index('Response')
+        for row in rows:
+            extra = len(row) - len(names)
+            if extra > 0:
+                row[i:i+extra+1] = [' '.join(row[i:i+extra+1])]
+    table = numpy.array(rows, dtype=str).reshape(len(lines), len(names))
+    return {name: table[:, i] for i, name in enumerate(names)}
+
+
+def _rts_us(columns):
+    # reaction times in us, from RT_us or from the ms of the legacy RT column
+    if 'RT_us' in columns:
+        return columns['RT_us'].astype(float)
+    return columns['RT'].astype(float)*1000
+
+
+def _mean(values):
+    # mean ignoring timeouts, NaN when nothing is left
+    values = values[~numpy.isnan(values)]
+    return values.mean() if len(values) else numpy.nan
+
+
+def score_session(upd_path):
+    """
+    This function scores one session. The removal score is the mean update
+
+    RT after the short cue delay minus the mean update RT after the long one,
+
+    i.e. how much faster participants updated given more time to remove the
+
+    cued item. Timed out updates are left out of the means.
+
+    Parameters:
+    upd_path - path of the session's <pid>upd.csv
+
+    Returns:
+    rows - list of dictionaries with the COLUMNS of the scores table
+    """
+
+    upd_path, mem_path = _session_files(upd_path)
+    directory, name = os.path.split(upd_path)
+    pid = name[:-len('upd.csv')]
+    task = os.path.basename(os.path.abspath(directory))
+
+    upd = read_table(upd_path)
+    upd_blocks = upd['Block'].astype(int)
+    rts = _rts_us(upd)
+    delays = upd['Delay'].astype(int)
+
+    if os.path.isfile(mem_path):
+        mem = read_table(mem_path)
+    else:
+        mem = {'Block': numpy.empty(0, dtype=str),
+               'Accuracy': numpy.empty(0, dtype=str)}
+    mem_blocks = mem['Block'].astype(int)
+    correct = mem['Accuracy'] == 'True'
+
+    rows = []
+    blocks = numpy.union1d(upd_blocks, mem_blocks)
+    for block in [None] + blocks.tolist():
+        in_upd = upd_blocks == block if block else numpy.full(len(rts), True)
+        in_mem = mem_blocks == block if block else numpy.full(len(correct),
+                                                              True)
+        rt_long = _mean(rts[in_upd & (delays == LONG_DELAY)])
+        rt_short = _mean(rts[in_upd & (delays == SHORT_DELAY)])
+        tests = int(in_mem.sum())
+        rows.append({'task': task, 'pid': pid, 'block': block or 'all',
+                     'updates': int(in_upd.sum()), 'rt_long_us': rt_long,
+                     'rt_short_us': rt_short,
+                     'removal_us': rt_short - rt_long, 'tests': tests,
+                     'accuracy': correct[in_mem].mean() if tests
+                                 else numpy.nan})
+
+    return rows
+
+
+def _session_files(upd_path):
+    # a session is its <pid>upd.csv and the <pid>mem.csv next to it
+    return [upd_path, upd_path[:-len('upd.csv')]+'mem.csv']
+
+
+def _signature(path):
+    # [size, mtime_ns, sha256] of a file, None if it does not exist
+    try:
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            return [stat.st_size, stat.st_mtime_ns,
+                    hashlib.sha256(file.read()).hexdigest()]
+    except FileNotFoundError:
+        return None
+
+
+def _unchanged(entry):
+    """
+    This function checks whether the files of a cached session are the ones
+
+    it was scored from. A file whose size and mtime match is trusted without
+
+    reading it. One that was only touched is recognised by its hash, and its
+
+    new mtime is stored so it is not hashed again.
+
+    Parameters:
+    entry - cache entry with the 'files' signatures of the session
+
+    Returns:
+    unchanged - True if the cached rows can be used
+    """
+
+    for path, cached in entry['files'].items():
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            if cached is not None:
+                return False
+            continue
+
+        if cached is None or stat.st_size != cached[0]:
+            return False
+        if stat.st_mtime_ns != cached[1]:
+            current = _signature(path)
+            if current is None or current[2] != cached[2]:
+                return False
+            entry['files'][path] = current
+
+    return True
+
+
+def score_entry(upd_path):
+    """
+    This function scores one session into a cache entry. The files are
+
+    signed before they are read, so a change made while scoring shows up as
+
+    a changed file on the next run.
+
+    Parameters:
+    upd_path - path of the session's <pid>upd.csv
+
+    Returns:
+    entry - dictionary with the 'files' signatures and the scores 'rows',
+
+    or with the 'error' which stopped the session from being scored
+    """
+
+    files = {path: _signature(path) for path in _session_files(upd_path)}
+    try:
+        return {'files': files, 'rows': score_session(upd_path)}
+    except (OSError, ValueError, KeyError, IndexError) as error:
+        return {'files': files, 'rows': [],
+                'error': type(error).__name__+': '+str(error)}
+
+
+def load_cache(path):
+    """
+    This function reads a scores cache, or starts an empty one.
+
+    Parameters:
+    path - cache file name
+
+    Returns:
+    cache - dictionary mapping absolute <pid>upd.csv paths to cache entries
+    """
+
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_cache(path, cache):
+    """
+    This function replaces a scores cache file in one step, so an interrupted
+
+    run never leaves a truncated cache behind.
+
+    Parameters:
+    path, cache - cache file name, dictionary of cache entries
+    """
+
+    with open(path+'.tmp', 'w') as file:
+        json.dump(cache, file)
+    os.replace(path+'.tmp', path)
+
+
+def score_study(paths, workers=None, cache=None):
+    """
+    This function scores many sessions in a pool of worker processes. With a
+
+    cache only sessions without an unchanged entry are scored. The cache is
+
+    updated in place and left holding exactly the given sessions which could
+
+    be scored, so failed ones are tried again on the next run.
+
+    Parameters:
+    paths, workers, cache - <pid>upd.csv paths, number of processes, by
+
+    default one per CPU, optional dictionary from load_cache
+
+    Returns:
+    rows, errors - scores table rows of every scored session, in the order
+
+    of paths, dictionary mapping the paths which failed to their error
+    """
+
+    if cache is None:
+        cache = {}
+    keys = [os.path.abspath(path) for path in paths]
+    stale = [key for key in keys if key not in cache or
+             not _unchanged(cache[key])]
+
+    if stale:
+        workers = workers or os.cpu_count()
+        chunksize = max(1, len(stale)//(4*workers))
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            entries = pool.map(score_entry, stale, chunksize=chunksize)
+            cache.update(zip(stale, entries))
+
+    errors = {key: cache.pop(key)['error'] for key in stale
+              if 'error' in cache[key]}
+    for key in set(cache) - set(keys):
+        del cache[key]
+
+    rows = []
+    for key in keys:
+        if key in cache:
+            rows.extend(cache[key]['rows'])
+
+    return rows, errors
+
+
+def write_table(path, rows):
+    """
+    This function writes scores table rows to a comma separated file.
+
+    Parameters:
+    path, rows - output file name, list of row dictionaries
+    """
+
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score every session of a '
+                                     'working memory removal study.')
+    parser.add_argument('directories', nargs='*', default=['.'])
+    parser.add_argument('-o', '--output', default='scores.csv')
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--no-cache', action='store_true',
+                        help='rescore every session')
+    args = parser.parse_args(argv)
+
+    cache_path = os.path.splitext(args.output)[0]+'_cache.json'
+    cache = {} if args.no_cache else load_cache(cache_path)
+
+    paths = find_sessions(args.directories)
+    rows, errors = score_study(paths, args.workers, cache)
+    write_table(args.output, rows)
+    save_cache(cache_path, cache)
+    for path, error in errors.items():
+        print('skipped', path+':', error, file=sys.stderr)
+    print('scored', len(paths) - len(errors), 'sessions into', args.output)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
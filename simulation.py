@@ -0,0 +1,314 @@
+# Headless simulation of the working memory removal task.
+
+# The task scripts' main functions are run on SDL's dummy video driver, with a
+
+# synthetic Participant plugged into inputs.source in place of the keyboard.
+
+# The participant answers every prompt the task waits for: it types a
+
+# participant ID, confirms updates after a random reaction time or lets them
+
+# time out, and recalls the tested stimuli with a given accuracy. Results are
+
+# written by the task itself, so sessions exercise the whole output pipeline
+
+# and can be scored with scoring.py. Unless a real display is asked for,
+
+# SDL's dummy video and audio drivers are used.
+
+# Sessions run on a timing.VirtualClock unless --real-time is given. Every
+
+# wait of the task and of the participant then returns at once with the clock
+
+# moved to the nominal time, so a session takes well under a second. Headless
+
+# sessions draw to a small window, as most of the remaining time went to
+
+# blitting full screen backgrounds, and -j runs sessions in several processes.
+
+# Results go to the --output directory, by default one under the system's
+
+# temporary directory, so simulated sessions never land among the real ones
+
+# in the task directories where scoring.py would pick them up.
+
+# python simulation.py letters/letters.py [-n sessions] [-j workers]
+
+# [-o directory] [--seed N] ...
+
+import argparse, concurrent.futures, os, runpy, string, sys, tempfile, time
+import numpy, pygame
+import inputs, timing, trial_schedule
+
+WINDOW = (400, 300)  # window size of headless sessions
+
+
+class Participant:
+    """
+    This class is a synthetic participant which answers the prompts of the
+
+    task. Reaction times are drawn from a lognormal distribution with the
+
+    given mean and standard deviation.
+
+    Attributes:
+    pid - participant ID typed at the start of a session
+
+    rt_mean_ms, rt_sd_ms - mean and standard deviation of reaction times
+
+    accuracy - probability that a recalled stimulus is correct
+
+    timeout_rate - probability that an update is not confirmed in time
+
+    rng - numpy random Generator all responses are drawn from
+
+    clock - clock the participant waits on, by default timing.active_clock
+    """
+
+    def __init__(self, pid='sim', rt_mean_ms=600, rt_sd_ms=150, accuracy=0.8,
+                 timeout_rate=0.02, rng=None, clock=None):
+        self.pid = pid
+        self.rt_mean_ms = rt_mean_ms
+        self.rt_sd_ms = rt_sd_ms
+        self.accuracy = accuracy
+        self.timeout_rate = timeout_rate
+        self.rng = numpy.random.default_rng(rng)
+        self.clock = clock
+
+        # parameters of the normal distribution underlying the lognormal
+        self._sigma = numpy.sqrt(numpy.log(1 + (rt_sd_ms/rt_mean_ms)**2))
+        self._mu = numpy.log(rt_mean_ms) - self._sigma**2/2
+
+    def reaction_time(self):
+        """
+        This function draws one reaction time in ms.
+        """
+
+        return self.rng.lognormal(self._mu, self._sigma)
+
+    def events(self, deadline_ns, prompt, answer):
+        """
+        This function waits as long as the participant takes to respond and
+
+        returns the key presses of the response, the inputs.source interface.
+
+        Parameters:
+        deadline_ns, prompt, answer - clock time in ns the task stops
+
+        waiting at or None, one of the inputs prompts, keys scored as correct
+
+        Returns:
+        events - list of KEYDOWN events, empty if the response timed out
+        """
+
+        if prompt == inputs.ENTRY:
+            return [_key(char) for char in self.pid] + [_key('\r')]
+
+        if prompt == inputs.CONTINUE:
+            return [_key(' ')]
+
+        if prompt == inputs.CONFIRM and self.rng.random() < self.timeout_rate:
+            keys = None
+        elif prompt == inputs.RECALL:
+            if self.rng.random() < self.accuracy:
+                keys = answer
+            else:
+                keys = self.wrong(answer)
+        else:
+            keys = ' '
+
+        clock = self.clock or timing.active_clock
+        respond_ns = clock.now() + int(self.reaction_time()*1e6)
+        if deadline_ns is not None and (keys is None or
+                                        respond_ns >= deadline_ns):
+            clock.sleep_until(deadline_ns)
+            return []
+
+        clock.sleep_until(respond_ns)
+        return [_key(char) for char in keys]
+
+    def wrong(self, answer):
+        """
+        This function makes an incorrect response by replacing one key of the
+
+        answer with another key of the same kind.
+
+        Parameters:
+        answer - keys scored as correct
+
+        Returns:
+        keys - string differing from answer in one position
+        """
+
+        i = self.rng.integers(len(answer))
+        if answer[i].isdigit():
+            choices = string.digits[1:]
+        else:
+            choices = string.ascii_lowercase
+        choices = [char for char in choices if char != answer[i]]
+
+        return answer[:i] + self.rng.choice(choices) + answer[i+1:]
+
+
+def _key(char):
+    if char == '\r':
+        key = pygame.K_RETURN
+    else:
+        key = pygame.key.key_code('space' if char == ' ' else char)
+    return pygame.event.Event(pygame.KEYDOWN, key=key, unicode=char, mod=0,
+                              scancode=0)
+
+
+def free_pid(directory, prefix, taken=()):
+    """
+    This function finds the first participant ID with a prefix that has no
+
+    results in a directory yet.
+
+    Parameters:
+    directory, prefix, taken - results directory, start of the ID, IDs
+
+    handed out already but without results yet
+
+    Returns:
+    pid - unused participant ID
+    """
+
+    n = 1
+    while (prefix+str(n) in taken or
+           os.path.isfile(os.path.join(directory, prefix+str(n)+'upd.csv'))):
+        n += 1
+
+    return prefix+str(n)
+
+
+def run_session(script, participant, clock=None, headless=True, output=None,
+                window=WINDOW):
+    """
+    This function runs one full session of a task script with a simulated
+
+    participant. The script reads its config from its own directory, and
+
+    writes its results there too unless an output directory is given.
+
+    Parameters:
+    script, participant, clock, headless - path of letters.py, digits.py or
+
+    words.py, Participant answering the prompts, clock to run the session on,
+
+    by default a new VirtualClock, boolean stating whether to draw to SDL's
+
+    dummy driver instead of the screen
+
+    output, window - directory the results are written to, size of the
+
+    window of a headless session or None for the size of the display
+
+    Returns:
+    session - the finished engine.Session
+    """
+
+    if clock is None:
+        clock = timing.VirtualClock()
+
+    environ = os.environ.copy()
+    if headless:  # read by SDL when the script opens its window
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+    script = os.path.abspath(script)
+    directory = os.path.dirname(script)
+    cwd = os.getcwd()
+
+    sys.path.insert(0, directory)
+    os.chdir(directory)
+    inputs.source = participant
+    timing.active_clock, system_clock = clock, timing.active_clock
+    try:
+        return runpy.run_path(script)['main'](
+            results_directory=output and os.path.abspath(output),
+            window_size=window if headless else None)
+    finally:
+        inputs.source = None
+        timing.active_clock = system_clock
+        os.chdir(cwd)
+        sys.path.remove(directory)
+        os.environ.clear()
+        os.environ.update(environ)
+
+
+def simulate(args, pid, seed):
+    """
+    This function runs one session of the command line's task with a new
+
+    participant, in a worker process when -j is given.
+
+    Parameters:
+    args, pid, seed - parsed command line, participant ID, SeedSequence of
+
+    the session's schedules and participant's responses
+
+    Returns:
+    seconds - time the session took
+    """
+
+    schedule_seed, response_seed = seed.spawn(2)
+    participant = Participant(pid, args.rt_mean, args.rt_sd, args.accuracy,
+                              args.timeouts, response_seed)
+    clock = timing.SystemClock() if args.real_time else None
+    start = time.perf_counter()
+    trial_schedule.shared_rng = numpy.random.default_rng(schedule_seed)
+    try:
+        run_session(args.script, participant, clock, output=args.output)
+    finally:
+        trial_schedule.shared_rng = None
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run simulated sessions of '
+                                     'a working memory removal task.')
+    parser.add_argument('script')
+    parser.add_argument('-n', '--sessions', type=int, default=1)
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='number of sessions run at once')
+    parser.add_argument('-o', '--output', default=None,
+                        help='directory the results are written to')
+    parser.add_argument('--pid-prefix', default='sim')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--rt-mean', type=float, default=600)
+    parser.add_argument('--rt-sd', type=float, default=150)
+    parser.add_argument('--accuracy', type=float, default=0.8)
+    parser.add_argument('--timeouts', type=float, default=0.02)
+    parser.add_argument('--real-time', action='store_true',
+                        help='wait on the system clock like a real session')
+    args = parser.parse_args(argv)
+
+    if args.output is None:
+        task = os.path.basename(os.path.dirname(os.path.abspath(args.script)))
+        args.output = os.path.join(tempfile.gettempdir(), 'wm_simulations',
+                                   task)
+    os.makedirs(args.output, exist_ok=True)
+
+    pids = []
+    for session in range(args.sessions):
+        pids.append(free_pid(args.output, args.pid_prefix, pids))
+    seeds = numpy.random.SeedSequence(args.seed).spawn(args.sessions)
+
+    if args.workers > 1:
+        pool = concurrent.futures.ProcessPoolExecutor(args.workers)
+        times = pool.map(simulate, [args]*args.sessions, pids, seeds)
+    else:
+        pool = None
+        times = map(simulate, [args]*args.sessions, pids, seeds)
+    try:
+        for pid, seconds in zip(pids, times):
+            print(pid, 'finished in', round(seconds, 2), 's')
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    print('results written to', args.output)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# Stimulus providers for the working memory removal task.
+
+# The letter, digit and word versions of the task only differ in the items
+
+# shown in the frames and in how a tested item is answered. Each provider
+
+# describes one stimulus set for the shared task engine, and the task config
+
+# selects one by name with the task option.
+
+import os
+import numpy
+
+DIGITS = list(range(1, 10))  # digits eligible for stimuli
+PREFIX = 3  # letters of a word typed to answer it
+
+_stores = {}  # WordStore of each word list file read so far
+
+
+class Letters:
+    """
+    This class provides letter stimuli from the alphabet config option. A
+
+    tested letter is answered with a single key press.
+
+    Attributes:
+    items - list of stimuli
+
+    spacing, wrap - minimum distance between the starting items and whether
+
+    it wraps around the item list, see trial_schedule.build_schedule
+
+    typed - boolean stating whether answers are typed out or a single key
+
+    groups - array of the group id of every item, items of one group may not
+
+    be in the frames together (see sampling.GroupSampler), or None
+    """
+
+    spacing, wrap = 2, True
+    typed = False
+    groups = None
+
+    def __init__(self, confg, directory):
+        self.items = list(confg.get('var', 'alphabet'))
+
+    def text(self, item):
+        """
+        This function returns the text shown for a stimulus.
+        """
+
+        return item
+
+    def answer(self, item):
+        """
+        This function returns the keys the participant must enter for a
+
+        stimulus to be scored as correct.
+        """
+
+        return item.lower()
+
+
+class Digits(Letters):
+    """
+    This class provides the digits 1 to 9 as stimuli. A tested digit is
+
+    answered with a single key press.
+    """
+
+    def __init__(self, confg, directory):
+        self.items = DIGITS
+
+    def text(self, item):
+        return str(item)
+
+    def answer(self, item):
+        return str(item)
+
+
+class WordStore:
+    """
+    This class holds a word list as compact arrays, along with the prefix
+
+    each word is answered by.
+
+    Attributes:
+    words - array of the words in file order
+
+    prefixes - array of the lower case first letters of each word
+
+    groups - array of the index of each word's prefix in a sorted array of
+
+    the distinct prefixes, so words sharing a prefix share a group
+    """
+
+    def __init__(self, path):
+        with open(path, 'r') as word_file:
+            self.words = numpy.array(word_file.read().split())
+
+        self.prefixes = numpy.char.lower(
+            self.words.astype('<U'+str(PREFIX)))
+        _, self.groups = numpy.unique(self.prefixes, return_inverse=True)
+
+
+def word_store(path):
+    """
+    This function returns the WordStore of a word list file, reading the
+
+    file only the first time it is asked for.
+
+    Parameters:
+    path - path of the word list file
+
+    Returns:
+    store - WordStore of the file
+    """
+
+    path = os.path.abspath(path)
+    if path not in _stores:
+        _stores[path] = WordStore(path)
+
+    return _stores[path]
+
+
+class Words(Letters):
+    """
+    This class provides words from a word list file in the task directory.
+
+    A tested word is answered by typing its first three letters, so the
+
+    frames never hold two words starting with the same three letters.
+    """
+
+    spacing, wrap = 1, False
+    typed = True
+
+    def __init__(self, confg, directory):
+        store = word_store(os.path.join(directory,
+                                        confg.get('var', 'wordlist',
+                                                  fallback='wordlist.txt')))
+        self.items = store.words
+        self.groups = store.groups
+
+    def text(self, item):
+        return str(item).lower()
+
+    def answer(self, item):
+        return str(item)[:PREFIX].lower()
+
+
+PROVIDERS = {'letters': Letters, 'digits': Digits, 'words': Words}
+
+
+def from_config(confg, directory):
+    """
+    This function creates the stimulus provider selected by a task config.
+
+    Parameters:
+    confg, directory - ConfigParser holding the task config, directory of
+
+    the config file which relative paths are read from
+
+    Returns:
+    provider - Letters, Digits or Words object
+    """
+
+    return PROVIDERS[confg.get('var', 'task')](confg, directory)
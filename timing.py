@@ -0,0 +1,224 @@
+# Presentation timing for the working memory removal task.
+
+# pygame.time.wait sleeps in whole milliseconds and can overshoot by an OS
+
+# scheduler quantum, which is as long as the effect being measured. The
+
+# Scheduler plans each onset on the monotonic high-resolution clock, sleeps
+
+# until shortly before it and spins for the rest, and records the intended
+
+# and actual onset of every cue and stimulus it presents. Reaction times are
+
+# measured from those onsets on the same clock.
+
+# The clock itself is pluggable. SystemClock reads and waits on the real
+
+# perf_counter_ns. VirtualClock only keeps a number which waits jump forward,
+
+# so a simulated session records the nominal times of every onset but takes
+
+# no longer than its drawing and file I/O.
+
+import time, pygame
+import audit, markers
+
+SPIN_MS = 2  # the last part of every wait is spent spinning on the clock
+
+
+class SystemClock:
+    """
+    This class is the monotonic high-resolution clock of the machine.
+    """
+
+    def now(self):
+        """
+        This function returns the current monotonic time in ns.
+        """
+
+        return time.perf_counter_ns()
+
+    def sleep_until(self, target_ns):
+        """
+        This function blocks until a target time, sleeping while the target
+
+        is far away and spinning on the clock for the last few ms.
+
+        Parameters:
+        target_ns - time in ns to wait for
+        """
+
+        remaining = target_ns - time.perf_counter_ns()
+        if remaining > SPIN_MS*1000000:
+            time.sleep((remaining - SPIN_MS*1000000)/1e9)
+        while time.perf_counter_ns() < target_ns:
+            pass
+
+
+class VirtualClock:
+    """
+    This class is a clock whose time only moves when something waits on it.
+
+    Attributes:
+    now_ns - current virtual time in ns
+    """
+
+    def __init__(self, start_ns=0):
+        self.now_ns = start_ns
+
+    def now(self):
+        """
+        This function returns the current virtual time in ns.
+        """
+
+        return self.now_ns
+
+    def sleep_until(self, target_ns):
+        """
+        This function moves the virtual time forward to a target at once.
+
+        Parameters:
+        target_ns - time in ns to wait for
+        """
+
+        self.now_ns = max(self.now_ns, target_ns)
+
+
+active_clock = SystemClock()  # used by new Schedulers and the input layer
+
+
+
+class Scheduler:
+    """
+    This class plans and presents timed display events on a clock, by
+
+    default the active_clock at the time it is created.
+
+    With a refresh rate every planned interval is rounded to a whole number
+
+    of refresh periods, so on a vsynced display each onset lands on the
+
+    refresh the plan was made for.
+
+    Attributes:
+    clock - SystemClock or VirtualClock all times are read from
+
+    epoch_ns - clock time that onsets are reported relative to
+
+    period_ns - refresh period in ns, or 0 when onsets are not frame locked
+
+    onsets - list of (label, intended_ns, actual_ns) for every presentation
+
+    sdl_offset_ns - clock time minus SDL ticks in ns at the last flip
+    """
+
+    def __init__(self, refresh_rate=0, clock=None):
+        self.clock = clock if clock is not None else active_clock
+        self.epoch_ns = self.clock.now()
+        self.period_ns = int(round(1e9/refresh_rate)) if refresh_rate else 0
+        self.onsets = []
+        self.sdl_offset_ns = 0
+
+    def now(self):
+        """
+        This function returns the current time of the clock in ns.
+        """
+
+        return self.clock.now()
+
+    def plan(self, after_ns, delay_ms):
+        """
+        This function plans an event a number of ms after a reference time.
+
+        Parameters:
+        after_ns, delay_ms - reference time in ns, delay after it in ms
+
+        Returns:
+        target_ns - intended onset time in ns
+        """
+
+        delay_ns = int(delay_ms)*1000000
+        if self.period_ns:
+            delay_ns = round(delay_ns/self.period_ns)*self.period_ns
+
+        return after_ns + delay_ns
+
+    def wait_until(self, target_ns):
+        """
+        This function blocks until a target time on the clock.
+
+        Parameters:
+        target_ns - time in ns to wait for
+        """
+
+        self.clock.sleep_until(target_ns)
+
+    def wait(self, delay_ms):
+        """
+        This function blocks for a number of ms.
+
+        Parameters:
+        delay_ms - time to wait in ms
+        """
+
+        self.wait_until(self.plan(self.now(), delay_ms))
+
+    def present(self, label, target_ns, flip):
+        """
+        This function waits for the intended onset of an event, shows it and
+
+        records when it actually appeared.
+
+        Parameters:
+        label, target_ns, flip - name of the event, intended onset in ns,
+
+        function which pushes the prepared frame to the display
+
+        Returns:
+        actual_ns - time in ns at which the flip completed
+        """
+
+        self.wait_until(target_ns)
+        flip()
+        actual_ns = self.clock.now()
+        self.sdl_offset_ns = actual_ns - pygame.time.get_ticks()*1000000
+        self.onsets.append((label, target_ns, actual_ns))
+        audit.record('cue' if label == 'cue' else 'stimulus', label,
+                     actual_ns, target_ns)
+        markers.emit(label, actual_ns)
+
+        return actual_ns
+
+    def event_time(self, event):
+        """
+        This function finds when an input event happened on the clock. It
+
+        should be called once, as soon as the event is taken off the queue;
+
+        inputs.KeyBuffer does so for every key press. SDL
+
+        event timestamps are used when pygame provides them, since they mark
+
+        when the key was queued rather than when it was read.
+
+        Parameters:
+        event - pygame input event
+
+        Returns:
+        t_ns, source - clock time of the event in ns, 'sdl' if the event
+
+        carried its own timestamp or 'perf' if it was stamped when read
+        """
+
+        timestamp = getattr(event, 'timestamp', None)
+        if timestamp is None:
+            return self.clock.now(), 'perf'
+
+        return timestamp*1000000 + self.sdl_offset_ns, 'sdl'
+
+    def to_us(self, t_ns):
+        """
+        This function converts a time in ns to integer us since the epoch.
+        """
+
+        return (t_ns - self.epoch_ns)//1000
@@ -0,0 +1,136 @@
+# Precomputed trial schedules for the working memory removal task.
+
+# Every random draw a session needs (starting stimuli, update stimuli, cued
+
+# frames, cue delays, block lengths and test orders) is made here before the
+
+# first stimulus is shown, so run_blocks only has to index into NumPy arrays
+
+# between display flips.
+
+import numpy, sampling
+
+CUE_DELAYS = (1500, 200)  # delays after cue; these determine the condition
+CUE_WINDOW = 1500  # first and second delays together are always this long
+END_CHANCE = 10  # each answered update has a 1 in 10 chance to end the block
+
+shared_rng = None  # Generator used when none is passed, to replay schedules
+
+
+class Schedule:
+    """
+    This class stores the random draws for a run of blocks as NumPy arrays.
+
+    Attributes:
+    start_sets - (blocks, 3) item indices shown at the start of each block
+
+    update_items - (blocks, updates) item index shown at each update step
+
+    update_frames - (blocks, updates) frame cued and updated at each step
+
+    delays - (blocks, updates) cue-to-update delay in ms (the condition)
+
+    first_delays - (blocks, updates) delay in ms before the cue is shown
+
+    block_lengths - (blocks,) number of update steps in each block
+
+    test_orders - (blocks, 3) order in which the frames are tested
+    """
+
+    def __init__(self, start_sets, update_items, update_frames, delays,
+                 block_lengths, test_orders):
+        self.start_sets = start_sets
+        self.update_items = update_items
+        self.update_frames = update_frames
+        self.delays = delays
+        self.first_delays = CUE_WINDOW - delays
+        self.block_lengths = block_lengths
+        self.test_orders = test_orders
+
+    def __len__(self):
+        return len(self.block_lengths)
+
+
+def build_schedule(blocks, updates, n_items, spacing=2, wrap=True, rng=None,
+                   groups=None, avoid_removed=0):
+    """
+    This function draws the full schedule for a run of blocks ahead of time.
+
+    Update items are drawn so that they never match an item currently held
+
+    in any frame, nor any of the last avoid_removed items removed from the
+
+    frames in the block. Each is drawn directly from the remaining items, so
+
+    every draw takes the same time. An update which times out is repeated
+
+    with the same draw, so the later steps stay valid. With groups, the
+
+    frames never hold two items of the same group, and start sets are drawn
+
+    without spacing.
+
+    Parameters:
+    blocks, updates, n_items, spacing, wrap, rng, groups, avoid_removed -
+
+    number of blocks, maximum number of updates per block, number of items
+
+    in the stimulus set, minimum distance between starting items, boolean
+
+    stating whether the spacing wraps around the item set, optional numpy
+
+    Generator (shared_rng or a fresh one if omitted), optional array of the
+
+    group id of every item, see sampling.GroupSampler, number of recently
+
+    removed items (or their groups) an update may not bring back
+
+    Returns:
+    schedule - Schedule object holding every draw for the blocks
+    """
+
+    if rng is None:
+        rng = shared_rng or numpy.random.default_rng()
+
+    # without groups every item is a group of its own
+    sampler = sampling.GroupSampler(numpy.arange(n_items) if groups is None
+                                    else groups)
+    if sampler.n_groups < 4 + avoid_removed:
+        raise ValueError('%d distinct items cannot avoid the 3 current and '
+                         '%d removed ones' % (sampler.n_groups, avoid_removed))
+
+    if groups is None:
+        start_sets = sampling.StartSampler(n_items, spacing,
+                                           wrap).draw_batch(blocks, rng)
+    else:
+        start_sets = numpy.array([sampler.draw_start(rng)
+                                  for block in range(blocks)],
+                                 dtype=numpy.intp).reshape(blocks, 3)
+    update_items = numpy.empty((blocks, updates), dtype=numpy.intp)
+    update_frames = rng.integers(0, 3, size=(blocks, updates))
+    delays = rng.choice(CUE_DELAYS, size=(blocks, updates))
+    item_groups = sampler.groups.tolist()
+
+    for block in range(blocks):
+        sample = [item_groups[item] for item in start_sets[block]]
+        removed = []
+
+        for step in range(updates):
+            # make sure update doesn't match any current or recently removed
+            # items
+            item = sampler.draw(sample + removed, rng)
+            update_items[block, step] = item
+
+            frame = update_frames[block, step]
+            if avoid_removed:
+                removed = (removed + [sample[frame]])[-avoid_removed:]
+            sample[frame] = item_groups[item]
+
+    # a block ends at the first answered step which draws the 1 in 10 chance
+    block_lengths = numpy.minimum(rng.geometric(1/END_CHANCE, size=blocks),
+                                  updates)
+    test_orders = rng.permuted(numpy.tile(numpy.arange(3), (blocks, 1)),
+                               axis=1)
+
+    return Schedule(start_sets, update_items, update_frames, delays,
+                    block_lengths, test_orders)
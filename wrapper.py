@@ -1,37 +1,61 @@
 #this function was adapted from a post made by user SpoonMeiser at stackoverflow:
 #https://stackoverflow.com/questions/49432109/how-to-wrap-text-in-pygame-using-pygame-font-font
 
-def renderTextCenteredAt(text, font, colour, x, y, screen, allowed_width):
+# wrapped and rendered lines of each (text, font, allowed_width, colour), so
+# a message shown again, like the timeout warning, is only blitted. The fonts
+# are gone after pygame.quit, so a session clears it with clearLayouts
+_layouts = {}
+
+
+def wrapLines(text, font, allowed_width):
     # first, split the text into words
     words = text.split()
 
     # now, construct lines out of these words
     lines = []
-    while len(words) > 0:
+    start = 0
+    while start < len(words):
         # get as many words as will fit within allowed_width
-        line_words = []
-        while len(words) > 0:
-            line_words.append(words.pop(0))
-            fw, fh = font.size(' '.join(line_words + words[:1]))
+        end = start
+        while end < len(words):
+            end += 1
+            fw, fh = font.size(' '.join(words[start:end+1]))
             if fw > allowed_width:
                 break
 
         # add a line consisting of those words
-        line = ' '.join(line_words)
-        lines.append(line)
-
-    # now we've split our text into lines that fit into the width, actually
-    # render them
-
-    # we'll render each line below the last, so we need to keep track of
-    # the culmative height of the lines we've rendered so far
-    y_offset = 0
-    ty = y
-    for line in lines:
-        fw, fh = font.size(line)
-
-        # (tx, ty) is the top-left of the font surface
-        tx = x - fw / 2
-        font_surface = font.render(line, True, colour)
-        screen.blit(font_surface, (tx, ty))
-        ty = ty + fh
+        lines.append(' '.join(words[start:end]))
+        start = end
+
+    return lines
+
+
+def layoutText(text, font, colour, allowed_width):
+    key = (text, font, allowed_width, colour)
+    if key not in _layouts:
+        # we'll render each line below the last, so we need to keep track of
+        # the culmative height of the lines we've rendered so far
+        layout = []
+        ty = 0
+        for line in wrapLines(text, font, allowed_width):
+            font_surface = font.render(line, True, colour)
+            fw, fh = font_surface.get_size()
+
+            # (tx, ty) is the top-left of the font surface, relative to the
+            # centre of the first line's top
+            layout.append((font_surface, (-fw / 2, ty)))
+            ty = ty + fh
+        _layouts[key] = layout
+
+    return _layouts[key]
+
+
+def clearLayouts():
+    # forget every cached layout, along with the fonts and surfaces it holds
+    _layouts.clear()
+
+
+def renderTextCenteredAt(text, font, colour, x, y, screen, allowed_width):
+    layout = layoutText(text, font, colour, allowed_width)
+    screen.blits([(font_surface, (x + tx, y + ty))
+                  for font_surface, (tx, ty) in layout], False)